@@ -1,5 +1,6 @@
 # app.py (fixed for your OCR + Hugging Face AI + existing features)
 import tempfile
+import hashlib
 
 import os
 import sys
@@ -13,16 +14,17 @@ from dotenv import load_dotenv
 from streamlit_lottie import st_lottie
 import requests
 from pyvis.network import Network
-import speech_recognition as sr
 import pyttsx3
 
 # ------------------- PATHS / PROJECT IMPORTS -------------------
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from core import ocr, nlp, granite_client, risk, db, report, hugging
+from core import nlp, normalize, risk, db, report, hugging, metrics, verdict_cache, export, jobs
+from core.incremental import IncrementalVerifier
 
 # ------------------- CONFIG / ENV -------------------
 load_dotenv()
 HF_API_KEY = os.getenv("HF_API_KEY")  # must be set in .env
+metrics.start_exporter()
 db.init_db()
 
 st.set_page_config(page_title="AI Prescription Verifier", layout="wide")
@@ -33,6 +35,7 @@ HF_MODEL = "google/flan-t5-large"
 HF_BASE = f"https://api-inference.huggingface.co/models/{HF_MODEL}"
 HF_HEADERS = {"Authorization": f"Bearer {HF_API_KEY}"} if HF_API_KEY else {}
 
+@metrics.timed("hf.call")
 def _call_hf(prompt: str, max_tokens: int = 200, temperature: float = 0.7):
     if not HF_API_KEY:
         raise RuntimeError("HF_API_KEY not set in .env")
@@ -52,35 +55,45 @@ def _call_hf(prompt: str, max_tokens: int = 200, temperature: float = 0.7):
             return data[0]["summary_text"].strip()
     return str(data)
 
-def get_ai_alternatives(drug_list):
-    if not drug_list:
-        return "No drugs provided."
+def _alternatives_prompt(drug_list):
     drug_text = ", ".join(drug_list) if isinstance(drug_list, (list, tuple)) else str(drug_list)
-    prompt = (
+    return (
         "You are a clinical decision support assistant. "
         f"Suggest up to 3 safer and effective alternative medications for: {drug_text}. "
         "For each alternative, write a brief reason why it is safer (1-2 sentences). "
         "Keep it concise and suitable for a clinician."
     )
+
+def _dosage_prompt(drug_list, age):
+    drug_text = ", ".join(drug_list) if isinstance(drug_list, (list, tuple)) else str(drug_list)
+    return (
+        "You are a clinical assistant. For the following medications: "
+        f"{drug_text} and a patient aged {age}, list key dosage cautions, monitoring needs, "
+        "and age-specific precautions (3-6 bullet points). Keep concise and clinical."
+    )
+
+def get_ai_alternatives(drug_list):
+    if not drug_list:
+        return "No drugs provided."
     try:
-        return _call_hf(prompt, max_tokens=180, temperature=0.2)
+        return _call_hf(_alternatives_prompt(drug_list), max_tokens=180, temperature=0.2)
     except Exception as e:
         return f"AI error: {e}"
 
 def get_ai_dosage_warnings(drug_list, age):
     if not drug_list:
         return "No drugs provided."
-    drug_text = ", ".join(drug_list) if isinstance(drug_list, (list, tuple)) else str(drug_list)
-    prompt = (
-        "You are a clinical assistant. For the following medications: "
-        f"{drug_text} and a patient aged {age}, list key dosage cautions, monitoring needs, "
-        "and age-specific precautions (3-6 bullet points). Keep concise and clinical."
-    )
     try:
-        return _call_hf(prompt, max_tokens=220, temperature=0.2)
+        return _call_hf(_dosage_prompt(drug_list, age), max_tokens=220, temperature=0.2)
     except Exception as e:
         return f"AI error: {e}"
 
+# Background variants: errors fail the job (so it can be resubmitted) instead of becoming the result
+jobs.register("hf.alternatives", lambda progress, drugs: _call_hf(_alternatives_prompt(drugs), max_tokens=180, temperature=0.2))
+jobs.register("hf.dosage", lambda progress, drugs, age: _call_hf(_dosage_prompt(drugs, age), max_tokens=220, temperature=0.2))
+# After every task is registered, so re-queued jobs from a previous run find their handler
+jobs.init_jobs()
+
 # ------------------- THEME & ANIMATION -------------------
 def load_lottieurl(url):
     r = requests.get(url)
@@ -118,10 +131,133 @@ if "risk_score" not in st.session_state:
     st.session_state.risk_score = 0
 if "saved_case_id" not in st.session_state:
     st.session_state.saved_case_id = None
-
-menu = ["Upload Prescription", "Drug Verification", "Doctor Override", "Reports & History"]
+if "own_case_ids" not in st.session_state:
+    st.session_state.own_case_ids = []  # every saved copy of the current prescription
+if "verifier" not in st.session_state:
+    st.session_state.verifier = None  # IncrementalVerifier for the Doctor Override tab
+if "last_diff" not in st.session_state:
+    st.session_state.last_diff = None
+if "pdf_job" not in st.session_state:
+    st.session_state.pdf_job = None
+if "extract_job" not in st.session_state:
+    st.session_state.extract_job = None
+
+menu = ["Upload Prescription", "Drug Verification", "Doctor Override", "Reports & History", "Analytics Dashboard"]
 choice = st.sidebar.radio("Navigate", menu)
 
+# ------------------- DEBUG: STAGE METRICS -------------------
+with st.sidebar.expander("🛠️ Debug: Stage Metrics"):
+    # Read-only: instrumentation is process-wide and its exporters start with the process,
+    # so it is switched by METRICS_ENABLED in .env rather than from any one session.
+    if not metrics.ENABLED:
+        st.caption("Instrumentation is off. Set METRICS_ENABLED=true in .env and restart to record timings.")
+    snap = metrics.snapshot()
+    if snap["stages"]:
+        st.dataframe(snap["stages"], hide_index=True)
+    else:
+        st.caption("No stage timings recorded yet.")
+    if snap["caches"]:
+        st.dataframe(snap["caches"], hide_index=True)
+    st.download_button(
+        "Download Prometheus metrics",
+        data=metrics.prometheus_text(),
+        file_name="metrics.prom",
+        mime="text/plain"
+    )
+
+# ------------------- PATIENT HISTORY -------------------
+def with_history(result, parsed):
+    """Adds interactions against the patient's still-active medications, if a patient ID is set."""
+    patient_id = parsed.get("patient_id")
+    if not patient_id:
+        return result
+    drugs = parsed.get("drugs", [])
+    # Only partners of the new drugs are fetched, never this prescription's own saved copies
+    active = db.active_medications(
+        patient_id, drugs=risk.history_partners(drugs), exclude_cases=st.session_state.own_case_ids
+    )
+    return risk.apply_history(result, drugs, active)
+
+def history_diff(diff, before, after):
+    """Extends an IncrementalVerifier diff with what `with_history` changed between two results."""
+    def hist(result):
+        return {(i["drug1"], i["drug2"]): i for i in (result or {}).get("interactions", []) if i.get("source") == "history"}
+    def hist_flags(result):
+        return {f for f in (result or {}).get("flags", []) if f.startswith(risk.HISTORY_FLAG_PREFIX)}
+    hb, ha = hist(before), hist(after)
+    fb, fa = hist_flags(before), hist_flags(after)
+    return {
+        **diff,
+        "score_before": before["risk_score"] if before else diff["score_before"],
+        "score_after": after["risk_score"],
+        "added_interactions": diff["added_interactions"] + [i for k, i in ha.items() if k not in hb],
+        "removed_interactions": diff["removed_interactions"] + [i for k, i in hb.items() if k not in ha],
+        "added_flags": diff["added_flags"] + sorted(fa - fb),
+        "removed_flags": diff["removed_flags"] + sorted(fb - fa),
+    }
+
+# ------------------- BACKGROUND JOBS -------------------
+def load_job_result(job):
+    """Copies a finished scan/voice job into the session and verifies it as Run Safety Check would."""
+    res = job["result"]
+    parsed = res["parsed"]
+    parsed["patient_id"] = st.session_state.parsed.get("patient_id")
+    st.session_state.raw_text = res["raw_text"]
+    st.session_state.parsed = parsed
+    st.session_state.verifier = None
+    st.session_state.saved_case_id = None
+    st.session_state.own_case_ids = []
+    result = verdict_cache.verify({**parsed, "patient_age": parsed.get("patient_age") or 30})
+    result = with_history(result, parsed)
+    st.session_state.result = result
+    st.session_state.risk_score = result["risk_score"]
+
+def submit_scan(file):
+    """Queues OCR for an uploaded file; the same file bytes map to the same job, even across sessions."""
+    data = file.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(tempfile.gettempdir(), f"scan_{digest}{os.path.splitext(file.name)[1]}")
+    if not os.path.exists(path):
+        with open(path, "wb") as fh:
+            fh.write(data)
+    return jobs.submit("scan", label=f"Scan {file.name}", dedupe_key=f"scan:{digest}", image_path=path)
+
+def job_status(job_id, pending_text):
+    """Shows a job's progress or error; returns its result once done."""
+    job = jobs.get(job_id)
+    if job is None:
+        return None
+    if job["status"] == "done":
+        return job["result"]
+    if job["status"] in jobs.ACTIVE:
+        st.progress(job["progress"], text=job["message"] or pending_text)
+        st.caption("Use Refresh in the sidebar's Background jobs panel to update.")
+    else:
+        st.error(f"{job['label']} {job['status']}: {job['error'] or job['message']}")
+    return None
+
+with st.sidebar.expander("⏳ Background jobs", expanded=True):
+    st.button("Refresh", key="jobs_refresh")
+    recent = jobs.list_jobs(limit=10)
+    if not recent:
+        st.caption("No jobs yet.")
+    for job in recent:
+        st.markdown(f"**{job['label']}** · {job['status']}")
+        if job["status"] in jobs.ACTIVE:
+            st.progress(job["progress"], text=job["message"] or "")
+            if st.button("Cancel", key=f"cancel_{job['id']}"):
+                jobs.cancel(job["id"])
+                st.rerun()
+        elif job["status"] == "done" and job["kind"] in ("scan", "voice"):
+            if st.button("Load", key=f"load_{job['id']}"):
+                load_job_result(job)
+                st.success("Loaded. Open 'Drug Verification' to review.")
+        elif job["status"] == "failed":
+            st.caption(job["error"])
+    if recent and st.button("Clear finished"):
+        jobs.clear_finished()
+        st.rerun()
+
 # ------------------- GAUGE CHART -------------------
 def risk_gauge(value: int):
     fig = go.Figure(go.Indicator(
@@ -145,28 +281,16 @@ def draw_interaction_graph(drugs, interactions):
     for d in drugs:
         net.add_node(d["name"], label=d["name"], color="#4CAF50")
     for i in interactions:
+        # Rule engines report canonical names, which may differ from an edited row
+        for nm in (i["drug1"], i["drug2"]):
+            if nm not in net.get_nodes():
+                net.add_node(nm, label=nm, color="#4CAF50")
         net.add_edge(i["drug1"], i["drug2"], color="red", title=i.get("risk", ""))
     net.save_graph("interaction_graph.html")
     HtmlFile = open("interaction_graph.html", 'r', encoding='utf-8')
     components.html(HtmlFile.read(), height=420)
 
 # ------------------- VOICE FUNCTIONS -------------------
-def capture_voice():
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        st.info("🎤 Listening... Speak your prescription now.")
-        audio = r.listen(source, phrase_time_limit=10)
-    try:
-        text = r.recognize_google(audio)
-        st.success("🗣️ Voice captured successfully!")
-        return text
-    except sr.UnknownValueError:
-        st.error("❌ Could not understand audio")
-        return ""
-    except sr.RequestError:
-        st.error("❌ Google API error")
-        return ""
-
 def speak_text(text):
     engine = pyttsx3.init()
     engine.say(text)
@@ -182,23 +306,38 @@ if choice == "Upload Prescription":
 
         if st.button("Extract Text"):
             if file is not None:
-                # Cross-platform temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.name)[1]) as tmp:
-                    tmp.write(file.read())
-                    tmp_path = tmp.name
-                
-                # Extract text & drug info
-                ocr_result = ocr.extract_drug_info(tmp_path)
-                st.session_state.raw_text = ocr_result.get("raw_text", "")
+                # OCR runs on the job pool so the page stays responsive
+                st.session_state.extract_job = submit_scan(file)
             else:
+                st.session_state.extract_job = None
                 st.session_state.raw_text = text_area or ""
+        if st.session_state.extract_job:
+            scanned = job_status(st.session_state.extract_job, "Running OCR...")
+            if scanned is not None:
+                st.session_state.raw_text = scanned["raw_text"]
+                st.session_state.extract_job = None
 
         st.text_area("Extracted Text", value=st.session_state.raw_text, height=220)
 
         if st.button("Parse Drugs & Age"):
-            st.session_state.parsed = nlp.extract_drug_structures(st.session_state.raw_text)
+            parsed = nlp.extract_drug_structures(st.session_state.raw_text)
+            parsed["drugs"] = normalize.normalize_drugs(parsed["drugs"])
+            st.session_state.parsed = parsed
+            st.session_state.verifier = None
+            st.session_state.saved_case_id = None  # a new prescription, not yet saved
+            st.session_state.own_case_ids = []
             st.success("✅ Parsed successfully. Switch to 'Drug Verification' tab to analyze.")
 
+        st.divider()
+        st.subheader("Queue scans in the background")
+        batch = st.file_uploader(
+            "Prescription files", type=["png", "jpg", "jpeg", "pdf"], accept_multiple_files=True, key="batch_upload"
+        )
+        if st.button("Queue scans") and batch:
+            for f in batch:
+                submit_scan(f)
+            st.success(f"Queued {len(batch)} scan(s). Follow progress in the sidebar and press Load when done.")
+
     with col2:
         st.info("💡 Tips:\n- If PDF text is empty, it may be an image PDF. Export as image and upload.\n- Include patient's age in the text for age-aware checks.")
 
@@ -209,20 +348,26 @@ elif choice == "Drug Verification":
     st.json(parsed)
 
     if st.button("🎤 Voice Input Prescription"):
-        voice_text = capture_voice()
-        if voice_text:
-            st.session_state.raw_text = voice_text
-            st.text_area("Extracted Prescription Text", value=voice_text, height=200)
-            st.session_state.parsed = nlp.extract_drug_structures(voice_text)
-            parsed = st.session_state.parsed
-            st.success("✅ Parsed successfully from voice input.")
+        jobs.submit("voice", label="Voice input")
+        st.info("🎤 Listening in the background... Speak your prescription now, then press Load in the sidebar.")
 
     age = st.number_input("Patient Age", min_value=0, max_value=120, value=int(parsed.get("patient_age") or 30))
     if age != parsed.get("patient_age"):
         parsed["patient_age"] = int(age)
+    patient_id = st.text_input("Patient ID (optional — enables checks against active medications)", value=parsed.get("patient_id") or "")
+    parsed["patient_id"] = patient_id.strip() or None
+
+    if parsed.get("patient_id"):
+        with st.expander("💊 Active medications from earlier prescriptions"):
+            active = db.active_medications(parsed["patient_id"])
+            if active:
+                st.dataframe(active, hide_index=True)
+            else:
+                st.write("No active medications on record.")
 
     if st.button("Run Safety Check"):
-        custom_risk = risk.score_from_drugs(parsed["drugs"], parsed.get("patient_age") or age)
+        custom_risk = verdict_cache.verify({**parsed, "patient_age": parsed.get("patient_age") or age})
+        custom_risk = with_history(custom_risk, parsed)
         st.session_state.result = custom_risk
         st.session_state.risk_score = custom_risk["risk_score"]
 
@@ -262,21 +407,36 @@ elif choice == "Drug Verification":
 
         draw_interaction_graph(parsed["drugs"], st.session_state.result.get("interactions", []))
 
+        # Hugging Face calls run as deduplicated jobs: reruns and repeat visits reuse the stored answer
+        drug_names = sorted({d["name"] for d in parsed["drugs"] if d.get("name")})
         with st.expander("🤖 AI-Suggested Safer Alternatives (Hugging Face)"):
-            try:
-                drug_names = [d["name"] for d in parsed["drugs"]]
-                ai_alts = get_ai_alternatives(drug_names)
-                st.write(ai_alts)
-            except Exception as e:
-                st.error(f"AI Alternative suggestion failed: {e}")
+            if not drug_names:
+                st.write("No drugs provided.")
+            elif not HF_API_KEY:
+                st.error("AI Alternative suggestion failed: HF_API_KEY not set in .env")
+            else:
+                job_id = jobs.submit(
+                    "hf.alternatives", label="AI alternatives",
+                    dedupe_key=f"hf.alternatives:{json.dumps(drug_names)}", drugs=drug_names
+                )
+                ai_alts = job_status(job_id, "Asking Hugging Face...")
+                if ai_alts is not None:
+                    st.write(ai_alts)
 
         with st.expander("⚠️ AI Dosage Warnings Based on Age (Hugging Face)"):
-            try:
-                drug_names = [d["name"] for d in parsed["drugs"]]
-                ai_warnings = get_ai_dosage_warnings(drug_names, parsed.get("patient_age"))
-                st.write(ai_warnings)
-            except Exception as e:
-                st.error(f"AI Dosage check failed: {e}")
+            if not drug_names:
+                st.write("No drugs provided.")
+            elif not HF_API_KEY:
+                st.error("AI Dosage check failed: HF_API_KEY not set in .env")
+            else:
+                age_now = parsed.get("patient_age")
+                job_id = jobs.submit(
+                    "hf.dosage", label="AI dosage warnings",
+                    dedupe_key=f"hf.dosage:{json.dumps([drug_names, age_now])}", drugs=drug_names, age=age_now
+                )
+                ai_warnings = job_status(job_id, "Asking Hugging Face...")
+                if ai_warnings is not None:
+                    st.write(ai_warnings)
 
         if st.button("🔊 Speak Risk Summary"):
             result = st.session_state.result
@@ -296,12 +456,39 @@ elif choice == "Doctor Override":
         edited = st.data_editor(parsed["drugs"], num_rows="dynamic", key="editor_drugs")
         st.session_state.parsed["drugs"] = edited
         if st.button("Re-Verify"):
-            granite_result = granite_client.analyze(st.session_state.parsed)
-            custom_risk = risk.score_from_drugs(parsed["drugs"], parsed.get("patient_age") or 30)
-            st.session_state.result = {**granite_result, **custom_risk}
+            # Only rows the doctor touched are re-scored; the engine keeps per-drug and per-pair state
+            age = parsed.get("patient_age") or 30
+            verifier = st.session_state.verifier
+            # The previous verdict of this prescription, history included, is the diff baseline
+            before = st.session_state.result if verifier is not None else None
+            if verifier is None:
+                verifier = st.session_state.verifier = IncrementalVerifier(patient_age=age)
+            elif verifier.patient_age != age:
+                verifier.set_age(age)
+            diff = verifier.sync(edited)
+            # Toggling back to an already-verified prescription is a signature lookup
+            custom_risk = verdict_cache.verify({**parsed, "patient_age": age}, compute=verifier.result)
+            custom_risk = with_history(custom_risk, parsed)
+            st.session_state.last_diff = history_diff(diff, before, custom_risk)
+            st.session_state.result = custom_risk
             st.session_state.risk_score = custom_risk["risk_score"]
             st.success("✅ Re-verified. Check 'Drug Verification' tab for updated results.")
 
+        diff = st.session_state.last_diff
+        if diff:
+            st.markdown("### What changed")
+            st.metric("Risk Score", diff["score_after"], delta=diff["score_after"] - diff["score_before"], delta_color="inverse")
+            for i in diff["added_interactions"]:
+                st.error(f"➕ Interaction: {i['drug1'].title()} + {i['drug2'].title()}")
+            for i in diff["removed_interactions"]:
+                st.success(f"➖ Interaction resolved: {i['drug1'].title()} + {i['drug2'].title()}")
+            for f in diff["added_flags"]:
+                st.warning(f"➕ {f}")
+            for f in diff["removed_flags"]:
+                st.info(f"➖ {f}")
+            if not any(diff[k] for k in ("added_interactions", "removed_interactions", "added_flags", "removed_flags")):
+                st.caption("No change in flags or interactions.")
+
 # ------------------- REPORTS & HISTORY -------------------
 elif choice == "Reports & History":
     st.subheader("Save current case and download report")
@@ -309,11 +496,12 @@ elif choice == "Reports & History":
     result = st.session_state.result
     risk_score = st.session_state.risk_score
 
-    c1, c2, _ = st.columns(3)
+    c1, c2, c3 = st.columns(3)
     with c1:
         if st.button("Save Case"):
             case_id = db.save_case(parsed, result, risk_score)
             st.session_state.saved_case_id = case_id
+            st.session_state.own_case_ids.append(case_id)
             st.success(f"💾 Saved case #{case_id}")
     with c2:
         if st.button("Download JSON"):
@@ -324,6 +512,60 @@ elif choice == "Reports & History":
                 file_name="case.json",
                 mime="application/json"
             )
+    with c3:
+        case_id = st.session_state.saved_case_id
+        if st.button("Build PDF report", disabled=case_id is None, help="Save the case first"):
+            outfile = os.path.join(tempfile.gettempdir(), f"case_{case_id}.pdf")
+            st.session_state.pdf_job = jobs.submit(
+                "pdf", label=f"PDF for case #{case_id}", dedupe_key=f"pdf:{case_id}", case_id=case_id, outfile=outfile
+            )
+        if st.session_state.pdf_job:
+            built = job_status(st.session_state.pdf_job, "Building PDF...")
+            if built and os.path.exists(built["path"]):
+                with open(built["path"], "rb") as fh:
+                    st.download_button("Download PDF", data=fh, file_name=os.path.basename(built["path"]), mime="application/pdf")
+
+    with st.expander("📤 Export case history (CSV / Parquet / Arrow)"):
+        e1, e2, e3 = st.columns(3)
+        with e1:
+            fmt = st.selectbox("Format", export.FORMATS)
+        with e2:
+            since = st.date_input("From", value=None)
+        with e3:
+            until = st.date_input("To", value=None)
+        export_patient = st.text_input("Patient ID (optional)", key="export_patient")
+        include_raw = st.checkbox("Include raw prescription text")
+        if st.button("Build export"):
+            # Only one export file per session is kept on disk
+            previous = st.session_state.get("export_file")
+            if previous and os.path.exists(previous[0]):
+                os.remove(previous[0])
+            st.session_state.export_file = None
+            # Streamed in chunks to a temp file, but st.download_button holds the finished file in
+            # memory, so this path is not bounded like the CLI; use `python -m core.export` for large histories.
+            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{fmt}") as tmp:
+                try:
+                    n = export.export_cases(
+                        tmp, fmt, include_raw_text=include_raw,
+                        since=since.isoformat() if since else None,
+                        until=until.isoformat() if until else None,
+                        patient_id=export_patient.strip() or None
+                    )
+                    st.session_state.export_file = (tmp.name, fmt, n)
+                except RuntimeError as e:
+                    st.error(str(e))
+            if not st.session_state.export_file:
+                os.remove(tmp.name)
+        if st.session_state.get("export_file"):
+            path, built_fmt, n = st.session_state.export_file
+            st.caption(f"{n} cases exported.")
+            with open(path, "rb") as fh:
+                st.download_button(
+                    f"Download {built_fmt.upper()} file",
+                    data=fh,
+                    file_name=f"cases.{built_fmt}",
+                    mime={"csv": "text/csv"}.get(built_fmt, "application/octet-stream")
+                )
 
     st.divider()
     st.subheader("History")
@@ -336,6 +578,55 @@ elif choice == "Reports & History":
     else:
         st.info("No saved cases yet.")
 
+# ------------------- ANALYTICS DASHBOARD -------------------
+elif choice == "Analytics Dashboard":
+    # Reads only the rollup tables maintained by db.save_case, never the case rows
+    st.subheader("Prescription analytics")
+    LEVEL_COLORS = {"Low": "#4CAF50", "Moderate": "orange", "High": "red"}
+
+    daily = db.rollup_daily(days=st.slider("Days of history", 7, 365, 90))
+    if not daily:
+        st.info("No saved cases in this period yet.")
+    else:
+        fig = go.Figure()
+        for level, color in LEVEL_COLORS.items():
+            rows = [r for r in daily if r["level"] == level]
+            fig.add_trace(go.Bar(x=[r["day"] for r in rows], y=[r["cases"] for r in rows], name=level, marker_color=color))
+        fig.update_layout(barmode="stack", title="Cases per day by risk level")
+        st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        hist = db.rollup_score_histogram()
+        fig = go.Figure(go.Bar(x=[h["range"] for h in hist], y=[h["cases"] for h in hist], marker_color="#4CAF50"))
+        fig.update_layout(title="Risk score distribution")
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        ages = db.rollup_age()
+        bands = ["child", "adolescent", "adult", "elderly", "unknown"]
+        fig = go.Figure()
+        for level, color in LEVEL_COLORS.items():
+            counts = {a["band"]: a["cases"] for a in ages if a["level"] == level}
+            fig.add_trace(go.Bar(x=bands, y=[counts.get(b, 0) for b in bands], name=level, marker_color=color))
+        fig.update_layout(barmode="stack", title="Age bands by risk level")
+        st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### Most frequent flagged combinations")
+        pairs = db.top_pairs(10)
+        if pairs:
+            st.dataframe([{"combination": f"{p['drug1'].title()} + {p['drug2'].title()}", "cases": p["hits"]} for p in pairs], hide_index=True)
+        else:
+            st.write("No flagged combinations yet.")
+    with col2:
+        st.markdown("### Most prescribed drugs")
+        top = db.top_drugs(10)
+        if top:
+            st.dataframe(top, hide_index=True)
+        else:
+            st.write("No drugs recorded yet.")
+
 # ------------------- FOOTER -------------------
 st.markdown("<hr>", unsafe_allow_html=True)
 st.markdown("<p style='text-align:center;color:gray;'>Built with ❤️ using Hugging Face & Granite for IBM Hackathon 2025</p>", unsafe_allow_html=True)
@@ -0,0 +1,39 @@
+# core/cache.py
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from core import metrics
+
+_MISSING = object()
+
+class LRUCache:
+    """Small thread-safe LRU map. Hits/misses are reported to metrics under `name`."""
+
+    def __init__(self, name: str, maxsize: int = 1024):
+        self.name = name
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+        metrics.record_cache(self.name, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
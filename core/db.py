@@ -1,61 +1,524 @@
+import argparse
 import json
 import sqlite3
-from typing import Dict, Any, List, Optional
+import zlib
+from collections import Counter
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from core import metrics, normalize, dosage, risk, granite_client
+from core.cache import LRUCache
 
 _DB_PATH = "prescriptions.sqlite"
 
+# Course length assumed when a prescription line carries no "for N days"
+DEFAULT_DURATION_DAYS = 30
+
 def _conn():
     return sqlite3.connect(_DB_PATH)
 
+# ------------------- SCHEMA MIGRATIONS -------------------
+# PRAGMA user_version records how many of MIGRATIONS a file has applied. Each
+# step is idempotent so files created by older builds (user_version 0 but some
+# tables present) upgrade cleanly.
+def _migrate_base(c) -> None:
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS prescriptions(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts DATETIME DEFAULT CURRENT_TIMESTAMP,
+            patient_age INTEGER,
+            drugs_json TEXT,
+            result_json TEXT,
+            risk_score INTEGER,
+            raw_text TEXT
+        )"""
+    )
+
+def _migrate_patients(c) -> None:
+    if "patient_id" not in _columns(c, "prescriptions"):
+        c.execute("ALTER TABLE prescriptions ADD COLUMN patient_id TEXT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_patient ON prescriptions(patient_id, id)")
+    # One row per prescribed drug, so active-medication lookups never touch the JSON blobs
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS medications(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            case_id INTEGER NOT NULL REFERENCES prescriptions(id),
+            patient_id TEXT NOT NULL,
+            drug TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            duration_days INTEGER NOT NULL,
+            end_date DATE NOT NULL
+        )"""
+    )
+    # Covers the active lookup: seek by patient, range-scan on end_date, read drug from the index
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_medications_active
+           ON medications(patient_id, end_date, start_date, drug, case_id)"""
+    )
+    c.execute(
+        """CREATE VIEW IF NOT EXISTS active_medications AS
+           SELECT patient_id, drug, start_date, duration_days, end_date, case_id
+           FROM medications
+           WHERE date('now') BETWEEN start_date AND end_date"""
+    )
+
+def _migrate_compact(c) -> None:
+    # Constant texts (explanations, flags, ...) stored once and referenced by id
+    c.execute("CREATE TABLE IF NOT EXISTS strings(id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE)")
+    cols = _columns(c, "prescriptions")
+    if "raw_text_z" not in cols:
+        c.execute("ALTER TABLE prescriptions ADD COLUMN raw_text_z BLOB")
+    if "storage_format" not in cols:
+        c.execute("ALTER TABLE prescriptions ADD COLUMN storage_format INTEGER NOT NULL DEFAULT 0")
+    last_id = 0
+    while True:
+        rows = c.execute(
+            """SELECT id, result_json, raw_text FROM prescriptions
+               WHERE storage_format = 0 AND id > ? ORDER BY id LIMIT 500""",
+            (last_id,)
+        ).fetchall()
+        if not rows:
+            break
+        c.executemany(
+            """UPDATE prescriptions SET result_json = ?, raw_text_z = ?, raw_text = NULL, storage_format = ?
+               WHERE id = ?""",
+            [
+                (_encode_result(c, json.loads(result_json or "{}")), _compress(raw_text or ""), STORAGE_FORMAT, case_id)
+                for case_id, result_json, raw_text in rows
+            ]
+        )
+        last_id = rows[-1][0]
+
+def _migrate_medication_partners(c) -> None:
+    # Seek straight to the handful of interaction partners of a new prescription
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_medications_drug
+           ON medications(patient_id, drug, end_date, start_date, case_id)"""
+    )
+
+def _migrate_rollup_drugs(c) -> None:
+    # Rebuilt so rollup_drug drops names counted before only recognised drugs were kept
+    c.execute("CREATE INDEX IF NOT EXISTS idx_rollup_drug_cases ON rollup_drug(cases DESC, drug)")
+    _rebuild_rollups(c)
+
+def _migrate_reintern(c) -> None:
+    # Re-encode compact rows written before the Granite texts became internable
+    last_id = 0
+    while True:
+        rows = c.execute(
+            """SELECT id, result_json FROM prescriptions
+               WHERE storage_format = ? AND id > ? ORDER BY id LIMIT 500""",
+            (STORAGE_FORMAT, last_id)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for case_id, result_json in rows:
+            encoded = _encode_result(c, _decode_result(c, result_json, STORAGE_FORMAT))
+            if encoded != result_json:
+                updates.append((encoded, case_id))
+        c.executemany("UPDATE prescriptions SET result_json = ? WHERE id = ?", updates)
+        last_id = rows[-1][0]
+
+def _migrations() -> list:
+    # Append new steps at the end; position i is schema version i + 1
+    return [
+        _migrate_base, _migrate_patients, _init_rollups, _migrate_compact, _migrate_medication_partners,
+        _migrate_rollup_drugs, _migrate_reintern,
+    ]
+
+def _columns(c, table: str) -> set:
+    return {r[1] for r in c.execute(f"PRAGMA table_info({table})")}
+
+@metrics.timed("db.init_db")
 def init_db():
     with _conn() as c:
-        c.execute(
-            """CREATE TABLE IF NOT EXISTS prescriptions(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts DATETIME DEFAULT CURRENT_TIMESTAMP,
-                patient_age INTEGER,
-                drugs_json TEXT,
-                result_json TEXT,
-                risk_score INTEGER,
-                raw_text TEXT
-            )"""
-        )
+        steps = _migrations()
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, len(steps) + 1):
+            steps[target - 1](c)
+            c.execute(f"PRAGMA user_version = {target}")
+
+# ------------------- COMPACT PAYLOADS -------------------
+# storage_format 0: legacy rows, result_json and raw_text as plain TEXT.
+# storage_format 1: INTERNED_FIELDS of result_json hold `strings` ids for knowledge-base texts
+# (other entries stay inline), raw text is zlib-compressed in raw_text_z.
+STORAGE_FORMAT = 1
+INTERNED_FIELDS = ("explanation", "flags", "alternatives", "predicted_risks", "dosage_suggestions")
 
+_strings = LRUCache("db.strings", maxsize=4096)
+_constant_texts: Optional[set] = None
+_AGE_FLAG_MESSAGES = {msg for _pred, msg, _radd in granite_client.AGE_FLAGS}
+
+def _internable(text: str) -> bool:
+    # Only texts copied verbatim from the rule tables repeat across cases. Per-case messages
+    # (exact doses, "case #N, until DATE") would make `strings` grow with the case count.
+    global _constant_texts
+    if _constant_texts is None:
+        texts = {risk.EXPLANATION, granite_client.EXPLANATION, *risk.PREDICTED_RISKS.values()}
+        for rule in risk.DRUG_RULES.values():
+            texts.update(rule["flags"])
+            texts.update(rule["alternatives"])
+        for alts in granite_client.ALTERNATIVES.values():
+            texts.update(alts)
+        for (a, b), reason in granite_client.RISKY_PAIRS.items():
+            texts.add(f"Interaction: {a.title()} + {b.title()} → {reason}")
+            texts.add(f"Interaction: {b.title()} + {a.title()} → {reason}")
+        _constant_texts = texts
+    if text in _constant_texts:
+        return True
+    # Granite age warnings: "Age warning for <Drug>: <AGE_FLAGS message>", one text per drug/message
+    head, _, msg = text.partition(": ")
+    return head.startswith("Age warning for ") and msg in _AGE_FLAG_MESSAGES
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+def _decompress(blob: Optional[bytes]) -> str:
+    return zlib.decompress(blob).decode("utf-8") if blob else ""
+
+def _intern(c, text: str) -> int:
+    c.execute("INSERT OR IGNORE INTO strings(text) VALUES (?)", (text,))
+    return c.execute("SELECT id FROM strings WHERE text = ?", (text,)).fetchone()[0]
+
+def _encode_result(c, result: Dict[str, Any]) -> str:
+    out = dict(result)
+    for field in INTERNED_FIELDS:
+        value = out.get(field)
+        if isinstance(value, str) and _internable(value):
+            out[field] = _intern(c, value)
+        elif isinstance(value, list):
+            out[field] = [_intern(c, v) if isinstance(v, str) and _internable(v) else v for v in value]
+    return json.dumps(out, ensure_ascii=False, separators=(",", ":"))
+
+def _resolve(c, ids: set) -> Dict[int, str]:
+    key = lambda i: (_DB_PATH, i)
+    found = {i: _strings.get(key(i)) for i in ids}
+    missing = [i for i, text in found.items() if text is None]
+    if missing:
+        marks = ",".join("?" * len(missing))
+        for i, text in c.execute(f"SELECT id, text FROM strings WHERE id IN ({marks})", missing):
+            found[i] = text
+            _strings.put(key(i), text)
+    return found
+
+def _decode_result(c, result_json: Optional[str], storage_format: int) -> Dict[str, Any]:
+    result = json.loads(result_json or "{}")
+    if storage_format != STORAGE_FORMAT:
+        return result
+    ids = set()
+    for field in INTERNED_FIELDS:
+        value = result.get(field)
+        if isinstance(value, int):
+            ids.add(value)
+        elif isinstance(value, list):
+            ids.update(v for v in value if isinstance(v, int))
+    if not ids:
+        return result
+    texts = _resolve(c, ids)
+    for field in INTERNED_FIELDS:
+        value = result.get(field)
+        if isinstance(value, int):
+            result[field] = texts.get(value, "")
+        elif isinstance(value, list):
+            result[field] = [texts.get(v, "") if isinstance(v, int) else v for v in value]
+    return result
+
+@metrics.timed("db.save_case")
 def save_case(parsed: Dict[str, Any], result: Dict[str, Any], risk_score: int) -> int:
     with _conn() as c:
         cur = c.cursor()
         cur.execute(
-            """INSERT INTO prescriptions(patient_age, drugs_json, result_json, risk_score, raw_text)
-                   VALUES (?, ?, ?, ?, ?)""",
+            """INSERT INTO prescriptions(patient_age, drugs_json, result_json, risk_score, raw_text_z, patient_id, storage_format)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
             (
                 parsed.get("patient_age"),
                 json.dumps(parsed.get("drugs", []), ensure_ascii=False),
-                json.dumps(result, ensure_ascii=False),
+                _encode_result(cur, result),
                 int(risk_score),
-                parsed.get("raw_text", "")[:4000]
+                _compress(parsed.get("raw_text", "")[:4000]),
+                parsed.get("patient_id") or None,
+                STORAGE_FORMAT
             )
         )
-        return cur.lastrowid
+        case_id = cur.lastrowid
+        if parsed.get("patient_id"):
+            _save_medications(cur, case_id, parsed)
+        _apply_rollups(cur, _case_rollup(None, parsed.get("patient_age"), parsed.get("drugs", []), result, risk_score))
+        return case_id
+
+def _save_medications(cur, case_id: int, parsed: Dict[str, Any]) -> None:
+    rows = []
+    for d in parsed.get("drugs", []):
+        # Only recognised drugs; parser noise like "Age 40" must not become an active medication
+        hit = normalize.lookup(d.get("name") or "")
+        if hit is None:
+            continue
+        days = dosage.parse_duration_days(d.get("duration")) or DEFAULT_DURATION_DAYS
+        rows.append((case_id, parsed["patient_id"], hit["canonical"], parsed.get("start_date"), days))
+    # end_date is inclusive: a 5-day course starting today ends in 4 days
+    cur.executemany(
+        """INSERT INTO medications(case_id, patient_id, drug, start_date, duration_days, end_date)
+               VALUES (?1, ?2, ?3, COALESCE(?4, date('now')), ?5, date(COALESCE(?4, date('now')), '+' || (?5 - 1) || ' days'))""",
+        rows
+    )
 
+@metrics.timed("db.active_medications")
+def active_medications(patient_id: str, as_of: Optional[str] = None, drugs: Optional[Iterable[str]] = None,
+                       exclude_cases: Iterable[int] = ()) -> List[Dict[str, Any]]:
+    """
+    Drugs from the patient's earlier prescriptions still within their course on `as_of`
+    (YYYY-MM-DD, default today). `drugs` limits the result to those canonical names (one
+    index seek each); `exclude_cases` leaves out cases, e.g. saved copies of the prescription being re-verified.
+    """
+    query = """SELECT drug, start_date, duration_days, end_date, case_id
+               FROM medications
+               WHERE patient_id = ? AND end_date >= COALESCE(?, date('now')) AND start_date <= COALESCE(?, date('now'))"""
+    params: List[Any] = [patient_id, as_of, as_of]
+    if drugs is not None:
+        drugs = sorted(set(drugs))
+        if not drugs:
+            return []
+        query += f" AND drug IN ({','.join('?' * len(drugs))})"
+        params += drugs
+    exclude_cases = sorted(set(exclude_cases))
+    if exclude_cases:
+        query += f" AND case_id NOT IN ({','.join('?' * len(exclude_cases))})"
+        params += exclude_cases
+    query += " ORDER BY start_date DESC, case_id DESC"
+    with _conn() as c:
+        rows = c.execute(query, params).fetchall()
+        return [
+            {"drug": r[0], "start_date": r[1], "duration_days": r[2], "end_date": r[3], "case_id": r[4]}
+            for r in rows
+        ]
+
+@metrics.timed("db.list_cases")
 def list_cases() -> List[Dict[str, Any]]:
     with _conn() as c:
-        rows = c.execute("SELECT id, ts, patient_age, risk_score FROM prescriptions ORDER BY id DESC").fetchall()
+        rows = c.execute("SELECT id, ts, patient_age, risk_score, patient_id FROM prescriptions ORDER BY id DESC").fetchall()
         return [
-            {"id": r[0], "timestamp": r[1], "patient_age": r[2], "risk_score": r[3]}
+            {"id": r[0], "timestamp": r[1], "patient_age": r[2], "risk_score": r[3], "patient_id": r[4]}
             for r in rows
         ]
 
+_CASE_COLUMNS = "id, ts, patient_age, drugs_json, result_json, risk_score, raw_text, patient_id, raw_text_z, storage_format"
+
+def _case_from_row(c, row) -> Dict[str, Any]:
+    return {
+        "id": row[0],
+        "timestamp": row[1],
+        "patient_age": row[2],
+        "drugs": json.loads(row[3] or "[]"),
+        "result": _decode_result(c, row[4], row[9]),
+        "risk_score": row[5],
+        "raw_text": row[6] or _decompress(row[8]),
+        "patient_id": row[7]
+    }
+
+@metrics.timed("db.get_case")
 def get_case(case_id: int) -> Optional[Dict[str, Any]]:
     with _conn() as c:
-        row = c.execute("SELECT id, ts, patient_age, drugs_json, result_json, risk_score, raw_text FROM prescriptions WHERE id=?", (case_id,)).fetchone()
+        row = c.execute(f"SELECT {_CASE_COLUMNS} FROM prescriptions WHERE id=?", (case_id,)).fetchone()
         if not row:
             return None
-        return {
-            "id": row[0],
-            "timestamp": row[1],
-            "patient_age": row[2],
-            "drugs": json.loads(row[3] or "[]"),
-            "result": json.loads(row[4] or "{}"),
-            "risk_score": row[5],
-            "raw_text": row[6] or ""
-        }
+        return _case_from_row(c, row)
+
+def iter_cases(since: Optional[str] = None, until: Optional[str] = None, patient_id: Optional[str] = None,
+               chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields decoded cases (as `get_case` returns them) in id order, one chunk at a time.
+    `since`/`until` are inclusive YYYY-MM-DD dates. Each chunk is its own short read
+    (keyset pagination on id), so a long export never holds a lock against save_case.
+    """
+    last_id = 0
+    while True:
+        with metrics.timer("db.iter_cases.chunk"), _conn() as c:
+            rows = c.execute(
+                f"""SELECT {_CASE_COLUMNS} FROM prescriptions
+                    WHERE id > ?1
+                      AND (?2 IS NULL OR ts >= ?2)
+                      AND (?3 IS NULL OR ts < date(?3, '+1 day'))
+                      AND (?4 IS NULL OR patient_id = ?4)
+                    ORDER BY id LIMIT ?5""",
+                (last_id, since, until, patient_id, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            cases = [_case_from_row(c, r) for r in rows]
+        last_id = rows[-1][0]
+        yield cases
+
+# ------------------- ANALYTICS ROLLUPS -------------------
+# Small aggregate tables kept in step with `prescriptions` by save_case, so the
+# dashboard never has to scan or json-decode the case rows.
+_ROLLUP_TABLES = {
+    "rollup_daily": """CREATE TABLE IF NOT EXISTS rollup_daily(
+        day DATE NOT NULL, level TEXT NOT NULL, cases INTEGER NOT NULL, score_sum INTEGER NOT NULL,
+        PRIMARY KEY(day, level))""",
+    "rollup_score": """CREATE TABLE IF NOT EXISTS rollup_score(
+        bucket INTEGER PRIMARY KEY, cases INTEGER NOT NULL)""",
+    "rollup_age": """CREATE TABLE IF NOT EXISTS rollup_age(
+        band TEXT NOT NULL, level TEXT NOT NULL, cases INTEGER NOT NULL,
+        PRIMARY KEY(band, level))""",
+    "rollup_drug": """CREATE TABLE IF NOT EXISTS rollup_drug(
+        drug TEXT PRIMARY KEY, cases INTEGER NOT NULL, flagged INTEGER NOT NULL)""",
+    "rollup_pair": """CREATE TABLE IF NOT EXISTS rollup_pair(
+        drug1 TEXT NOT NULL, drug2 TEXT NOT NULL, hits INTEGER NOT NULL,
+        PRIMARY KEY(drug1, drug2))""",
+}
+
+def _init_rollups(c) -> None:
+    for ddl in _ROLLUP_TABLES.values():
+        c.execute(ddl)
+    # Backfill once for databases created before the rollups existed
+    if c.execute("SELECT 1 FROM rollup_score LIMIT 1").fetchone() is None and \
+            c.execute("SELECT 1 FROM prescriptions LIMIT 1").fetchone() is not None:
+        _rebuild_rollups(c)
+
+def _case_rollup(day: Optional[str], patient_age, drugs: List[Dict[str, Any]], result: Dict[str, Any], risk_score) -> Dict[str, Any]:
+    """Everything one case contributes to the rollup tables."""
+    score = int(risk_score or 0)
+    level = risk.risk_level(score)
+    # Recognised drugs only: OCR noise and lines like "Patient age 70 years" would
+    # otherwise add a rollup_drug row per case
+    hits = (normalize.lookup(d["name"]) for d in drugs if d.get("name"))
+    names = {hit["canonical"] for hit in hits if hit}
+    pairs = set()
+    for i in result.get("interactions", []) or []:
+        if i.get("drug1") and i.get("drug2"):
+            pairs.add(tuple(sorted((i["drug1"], i["drug2"]))))
+    flagged = {d for p in pairs for d in p}
+    return {
+        "day": day,
+        "level": level,
+        "score": score,
+        "bucket": min(score // 10, 10),
+        "band": "unknown" if patient_age is None else dosage.age_band(patient_age),
+        "drugs": {n: (1, int(n in flagged)) for n in names},
+        "pairs": pairs,
+    }
+
+def _apply_rollups(cur, r: Dict[str, Any]) -> None:
+    cur.execute(
+        """INSERT INTO rollup_daily(day, level, cases, score_sum) VALUES (COALESCE(?, date('now')), ?, 1, ?)
+           ON CONFLICT(day, level) DO UPDATE SET cases = cases + 1, score_sum = score_sum + excluded.score_sum""",
+        (r["day"], r["level"], r["score"])
+    )
+    cur.execute(
+        "INSERT INTO rollup_score(bucket, cases) VALUES (?, 1) ON CONFLICT(bucket) DO UPDATE SET cases = cases + 1",
+        (r["bucket"],)
+    )
+    cur.execute(
+        """INSERT INTO rollup_age(band, level, cases) VALUES (?, ?, 1)
+           ON CONFLICT(band, level) DO UPDATE SET cases = cases + 1""",
+        (r["band"], r["level"])
+    )
+    cur.executemany(
+        """INSERT INTO rollup_drug(drug, cases, flagged) VALUES (?, ?, ?)
+           ON CONFLICT(drug) DO UPDATE SET cases = cases + excluded.cases, flagged = flagged + excluded.flagged""",
+        [(n, n_cases, n_flagged) for n, (n_cases, n_flagged) in r["drugs"].items()]
+    )
+    cur.executemany(
+        """INSERT INTO rollup_pair(drug1, drug2, hits) VALUES (?, ?, 1)
+           ON CONFLICT(drug1, drug2) DO UPDATE SET hits = hits + 1""",
+        sorted(r["pairs"])
+    )
+
+def _rebuild_rollups(c) -> int:
+    daily: Counter = Counter()
+    daily_score: Counter = Counter()
+    buckets: Counter = Counter()
+    ages: Counter = Counter()
+    drug_cases: Counter = Counter()
+    drug_flagged: Counter = Counter()
+    pairs: Counter = Counter()
+    n = 0
+    # Only `interactions` is read from result_json and it is never interned, so both storage formats work as-is
+    cur = c.execute("SELECT date(ts), patient_age, drugs_json, result_json, risk_score FROM prescriptions")
+    while True:
+        rows = cur.fetchmany(1000)
+        if not rows:
+            break
+        for day, age, drugs_json, result_json, score in rows:
+            r = _case_rollup(day, age, json.loads(drugs_json or "[]"), json.loads(result_json or "{}"), score)
+            daily[(r["day"], r["level"])] += 1
+            daily_score[(r["day"], r["level"])] += r["score"]
+            buckets[r["bucket"]] += 1
+            ages[(r["band"], r["level"])] += 1
+            for name, (n_cases, n_flagged) in r["drugs"].items():
+                drug_cases[name] += n_cases
+                drug_flagged[name] += n_flagged
+            pairs.update(r["pairs"])
+            n += 1
+    for table in _ROLLUP_TABLES:
+        c.execute(f"DELETE FROM {table}")
+    c.executemany("INSERT INTO rollup_daily VALUES (?, ?, ?, ?)", [(d, l, k, daily_score[(d, l)]) for (d, l), k in daily.items()])
+    c.executemany("INSERT INTO rollup_score VALUES (?, ?)", list(buckets.items()))
+    c.executemany("INSERT INTO rollup_age VALUES (?, ?, ?)", [(b, l, k) for (b, l), k in ages.items()])
+    c.executemany("INSERT INTO rollup_drug VALUES (?, ?, ?)", [(d, k, drug_flagged[d]) for d, k in drug_cases.items()])
+    c.executemany("INSERT INTO rollup_pair VALUES (?, ?, ?)", [(a, b, k) for (a, b), k in pairs.items()])
+    return n
+
+@metrics.timed("db.rebuild_rollups")
+def rebuild_rollups() -> int:
+    """Recomputes every rollup table from `prescriptions`; returns the number of cases scanned."""
+    with _conn() as c:
+        return _rebuild_rollups(c)
+
+@metrics.timed("db.rollup_daily")
+def rollup_daily(days: int = 90) -> List[Dict[str, Any]]:
+    with _conn() as c:
+        rows = c.execute(
+            """SELECT day, level, cases, score_sum FROM rollup_daily
+               WHERE day >= date('now', ?) ORDER BY day""",
+            (f"-{int(days)} days",)
+        ).fetchall()
+        return [{"day": r[0], "level": r[1], "cases": r[2], "avg_score": r[3] / r[2] if r[2] else 0} for r in rows]
+
+@metrics.timed("db.rollup_score_histogram")
+def rollup_score_histogram() -> List[Dict[str, Any]]:
+    with _conn() as c:
+        rows = c.execute("SELECT bucket, cases FROM rollup_score ORDER BY bucket").fetchall()
+        return [{"range": f"{b * 10}-{min(b * 10 + 9, 100)}" if b < 10 else "100", "cases": k} for b, k in rows]
+
+@metrics.timed("db.rollup_age")
+def rollup_age() -> List[Dict[str, Any]]:
+    with _conn() as c:
+        rows = c.execute("SELECT band, level, cases FROM rollup_age").fetchall()
+        return [{"band": r[0], "level": r[1], "cases": r[2]} for r in rows]
+
+@metrics.timed("db.top_drugs")
+def top_drugs(limit: int = 10) -> List[Dict[str, Any]]:
+    with _conn() as c:
+        rows = c.execute("SELECT drug, cases, flagged FROM rollup_drug ORDER BY cases DESC, drug LIMIT ?", (limit,)).fetchall()
+        return [{"drug": r[0], "cases": r[1], "flagged": r[2]} for r in rows]
+
+@metrics.timed("db.top_pairs")
+def top_pairs(limit: int = 10) -> List[Dict[str, Any]]:
+    with _conn() as c:
+        rows = c.execute("SELECT drug1, drug2, hits FROM rollup_pair ORDER BY hits DESC, drug1, drug2 LIMIT ?", (limit,)).fetchall()
+        return [{"drug1": r[0], "drug2": r[1], "hits": r[2]} for r in rows]
+
+# ------------------- CLI -------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    global _DB_PATH
+    parser = argparse.ArgumentParser(prog="python -m core.db", description="Prescription database maintenance")
+    parser.add_argument("--db", default=_DB_PATH, help="SQLite file (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild-rollups", help="recompute the analytics rollup tables from all cases")
+    migrate = sub.add_parser("migrate", help="upgrade the schema (and compact existing cases)")
+    migrate.add_argument("--vacuum", action="store_true", help="reclaim the space freed by compaction")
+    args = parser.parse_args(argv)
+    _DB_PATH = args.db
+    init_db()
+    if args.command == "rebuild-rollups":
+        print(f"Rebuilt rollups from {rebuild_rollups()} cases")
+    elif args.command == "migrate":
+        if args.vacuum:
+            c = _conn()
+            c.execute("VACUUM")
+            c.close()
+        print(f"{_DB_PATH} is at schema version {len(_migrations())}")
+
+if __name__ == "__main__":
+    main()
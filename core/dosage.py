@@ -0,0 +1,224 @@
+# core/dosage.py
+import re
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core import metrics, normalize
+
+# ------------------- PARSING -------------------
+_DOSE_VALUE = re.compile(r"(\d+(?:\.\d+)?)\s*(mg|mcg|ug|µg|g|ml|units|iu)\b", re.I)
+_TO_MG = {"mg": 1.0, "mcg": 0.001, "ug": 0.001, "µg": 0.001, "g": 1000.0}
+
+FREQ_PER_DAY = {
+    "od": 1, "hs": 1, "daily": 1, "nightly": 1, "stat": 1,
+    "bd": 2, "bid": 2,
+    "tid": 3, "tds": 3,
+    "qid": 4, "qds": 4,
+}
+# As needed: no fixed doses per day, so only the single dose can be checked
+AS_NEEDED = {"prn", "sos"}
+_TIMES = {"once": 1, "twice": 2, "thrice": 3}
+
+def parse_dose_mg(dosage: Any) -> Optional[float]:
+    """Single dose in mg from a `DOSE_PAT` capture ("500mg", "1 g", "250 mcg"); None for ml/units or junk."""
+    if not isinstance(dosage, str):
+        return None
+    m = _DOSE_VALUE.search(dosage)
+    if not m:
+        return None
+    factor = _TO_MG.get(m.group(2).lower())
+    return float(m.group(1)) * factor if factor else None
+
+def parse_frequency(freq: Any) -> Optional[float]:
+    """Doses per day from a `FREQ_PAT` capture ("1-0-1", "2/day", "TDS", "twice daily"); None if unknown or PRN."""
+    if not isinstance(freq, str):
+        return None
+    f = freq.strip().lower().replace(" ", "")
+    if not f:
+        return None
+    if f in FREQ_PER_DAY:
+        return float(FREQ_PER_DAY[f])
+    if re.fullmatch(r"\d-\d-\d", f):
+        return float(sum(int(x) for x in f.split("-")))
+    m = re.fullmatch(r"(\d)/day", f)
+    if m:
+        return float(m.group(1))
+    m = re.fullmatch(r"(once|twice|thrice)(?:a)?(?:daily|day)", f)
+    if m:
+        return float(_TIMES[m.group(1)])
+    return None
+
+def unrecognised_frequency(freq: Any) -> bool:
+    """True when a frequency was written but cannot be turned into doses per day."""
+    if not isinstance(freq, str) or not freq.strip():
+        return False
+    return freq.strip().lower() not in AS_NEEDED and parse_frequency(freq) is None
+
+def parse_duration_days(duration: Any) -> Optional[int]:
+    """Course length in days from a `DURATION_PAT` capture ("5 days", "2 weeks", "1 month")."""
+    if not isinstance(duration, str):
+        return None
+    m = re.fullmatch(r"(\d+)\s*(d|days?|wks?|weeks?|months?)", duration.strip().lower())
+    if not m:
+        return None
+    n, unit = int(m.group(1)), m.group(2)
+    if unit.startswith("w"):
+        return n * 7
+    if unit.startswith("m"):
+        return n * 30
+    return n
+
+def daily_mg(dosage: Any, freq: Any) -> Optional[float]:
+    """mg/day; a missing or as-needed frequency is counted as once daily, an unrecognised one gives None."""
+    single = parse_dose_mg(dosage)
+    if single is None or unrecognised_frequency(freq):
+        return None
+    per_day = parse_frequency(freq)
+    return single * (per_day if per_day is not None else 1.0)
+
+# ------------------- DOSE LIMITS -------------------
+# Age bands as [lower, upper) in years; unknown age is checked against "adult"
+AGE_BANDS = (("child", 0, 12), ("adolescent", 12, 18), ("adult", 18, 65), ("elderly", 65, 200))
+_DEFAULT_BAND = 2
+
+# drug -> band -> (max single dose mg, max daily dose mg). Demo values; confirm against the local formulary.
+DOSE_LIMITS = {
+    "paracetamol": {"child": (500, 2000), "adolescent": (1000, 4000), "adult": (1000, 4000), "elderly": (1000, 3000)},
+    "ibuprofen": {"child": (200, 800), "adolescent": (400, 1200), "adult": (800, 3200), "elderly": (400, 1200)},
+    "aspirin": {"adolescent": (1000, 4000), "adult": (1000, 4000), "elderly": (325, 1000)},
+    "naproxen": {"adolescent": (500, 1000), "adult": (500, 1000), "elderly": (250, 500)},
+    "warfarin": {"adult": (10, 10), "elderly": (5, 5)},
+    "metformin": {"adolescent": (1000, 2000), "adult": (1000, 2550), "elderly": (1000, 2000)},
+    "amoxicillin": {"child": (500, 1500), "adolescent": (1000, 3000), "adult": (1000, 3000), "elderly": (1000, 3000)},
+    "ciprofloxacin": {"adult": (750, 1500), "elderly": (500, 1000)},
+    "levofloxacin": {"adult": (750, 750), "elderly": (500, 500)},
+    "azithromycin": {"child": (250, 500), "adolescent": (500, 500), "adult": (500, 500), "elderly": (500, 500)},
+    "clarithromycin": {"adolescent": (500, 1000), "adult": (500, 1000), "elderly": (500, 1000)},
+    "lisinopril": {"adult": (80, 80), "elderly": (40, 40)},
+    "losartan": {"adult": (100, 100), "elderly": (100, 100)},
+    "atorvastatin": {"adult": (80, 80), "elderly": (80, 80)},
+    "simvastatin": {"adult": (40, 40), "elderly": (40, 40)},
+    "rosuvastatin": {"adult": (40, 40), "elderly": (20, 20)},
+    "omeprazole": {"adolescent": (40, 40), "adult": (40, 80), "elderly": (40, 40)},
+    "pantoprazole": {"adult": (40, 80), "elderly": (40, 80)},
+    "prednisone": {"adult": (80, 80), "elderly": (60, 60)},
+    "furosemide": {"adult": (80, 600), "elderly": (40, 240)},
+    "levothyroxine": {"adult": (0.3, 0.3), "elderly": (0.2, 0.2)},
+    "clopidogrel": {"adult": (600, 600), "elderly": (300, 300)},
+}
+
+_DRUG_INDEX = {name: i for i, name in enumerate(DOSE_LIMITS)}
+_BAND_NAMES = [b[0] for b in AGE_BANDS]
+_BAND_EDGES = np.array([b[1] for b in AGE_BANDS] + [AGE_BANDS[-1][2]], dtype=float)
+
+def _limit_matrix(pos: int) -> np.ndarray:
+    # (n_drugs, n_bands) lookup table, NaN where no limit is defined
+    m = np.full((len(DOSE_LIMITS), len(AGE_BANDS)), np.nan)
+    for name, bands in DOSE_LIMITS.items():
+        for band, limits in bands.items():
+            m[_DRUG_INDEX[name], _BAND_NAMES.index(band)] = limits[pos]
+    return m
+
+MAX_SINGLE = _limit_matrix(0)
+MAX_DAILY = _limit_matrix(1)
+
+def age_band(age: Optional[float]) -> str:
+    return _BAND_NAMES[int(_band_index(np.array([np.nan if age is None else age], dtype=float))[0])]
+
+def _band_index(ages: np.ndarray) -> np.ndarray:
+    idx = np.searchsorted(_BAND_EDGES, ages, side="right") - 1
+    idx = np.clip(idx, 0, len(AGE_BANDS) - 1)
+    return np.where(np.isnan(ages), _DEFAULT_BAND, idx)
+
+# ------------------- CHECKS -------------------
+def _evaluate(names: Sequence[str], ages: np.ndarray, single: np.ndarray, daily: np.ndarray,
+              freq_unknown: np.ndarray, freqs: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Compares every row against its drug/age-band limits in one pass of array operations.
+    One issue per row, in order of severity: single-dose overdose, daily overdose, then an
+    unrecognised frequency on a drug with a daily limit (its daily dose cannot be checked).
+    """
+    drug_idx = np.array([_DRUG_INDEX.get(n, -1) for n in names], dtype=int)
+    known = drug_idx >= 0
+    band = _band_index(ages)
+    lim_single = np.where(known, MAX_SINGLE[np.where(known, drug_idx, 0), band], np.nan)
+    lim_daily = np.where(known, MAX_DAILY[np.where(known, drug_idx, 0), band], np.nan)
+    with np.errstate(invalid="ignore"):
+        over_single = single > lim_single
+        over_daily = daily > lim_daily
+    unchecked = freq_unknown & ~np.isnan(lim_daily) & ~np.isnan(single)
+    issues: List[Dict[str, Any]] = []
+    for i in np.flatnonzero(over_single | over_daily | unchecked):
+        issue = {"row": int(i), "drug": names[i], "band": _BAND_NAMES[band[i]]}
+        if over_single[i]:
+            issue.update(kind="single", dose_mg=float(single[i]), limit_mg=float(lim_single[i]))
+            issue["message"] = f"{names[i].title()} single dose {single[i]:g} mg exceeds {lim_single[i]:g} mg ({issue['band']})."
+        elif not over_daily[i]:
+            issue.update(kind="frequency", dose_mg=float(single[i]), limit_mg=float(lim_daily[i]))
+            issue["message"] = (
+                f"{names[i].title()} frequency '{freqs[i]}' not recognised; daily dose not checked "
+                f"against {lim_daily[i]:g} mg/day ({issue['band']})."
+            )
+        else:
+            issue.update(kind="daily", dose_mg=float(daily[i]), limit_mg=float(lim_daily[i]))
+            issue["message"] = f"{names[i].title()} daily dose {daily[i]:g} mg/day exceeds {lim_daily[i]:g} mg/day ({issue['band']})."
+        issues.append(issue)
+    return issues
+
+def _rows(drugs: List[Dict[str, Any]]) -> Tuple[List[str], List[float], List[float], List[bool], List[str]]:
+    names, single, daily, freq_unknown, freqs = [], [], [], [], []
+    for d in drugs:
+        if not d.get("name"):
+            continue
+        s = parse_dose_mg(d.get("dosage"))
+        day = daily_mg(d.get("dosage"), d.get("frequency"))
+        names.append(normalize.canonical_name(d["name"]))
+        single.append(np.nan if s is None else s)
+        daily.append(np.nan if day is None else day)
+        freq_unknown.append(unrecognised_frequency(d.get("frequency")))
+        freqs.append(str(d.get("frequency") or "").strip())
+    return names, single, daily, freq_unknown, freqs
+
+@metrics.timed("dosage.check_doses")
+def check_doses(drugs: List[Dict[str, Any]], patient_age: Optional[float]) -> List[Dict[str, Any]]:
+    """Dose-limit issues for one prescription; `row` indexes the named drugs in order."""
+    names, single, daily, freq_unknown, freqs = _rows(drugs)
+    if not names:
+        return []
+    ages = np.full(len(names), np.nan if patient_age is None else float(patient_age))
+    return _evaluate(
+        names, ages, np.array(single, dtype=float), np.array(daily, dtype=float), np.array(freq_unknown, dtype=bool), freqs
+    )
+
+@metrics.timed("dosage.check_batch")
+def check_batch(prescriptions: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Dose-limit issues for many parsed prescriptions ({"patient_age", "drugs"}) in a single vectorized pass."""
+    names: List[str] = []
+    single: List[float] = []
+    daily: List[float] = []
+    freq_unknown: List[bool] = []
+    freqs: List[str] = []
+    ages: List[float] = []
+    owner: List[int] = []
+    offsets: List[int] = []
+    for p_idx, p in enumerate(prescriptions):
+        n, s, d, u, f = _rows(p.get("drugs", []))
+        age = p.get("patient_age")
+        offsets.append(len(names))
+        names += n
+        single += s
+        daily += d
+        freq_unknown += u
+        freqs += f
+        ages += [np.nan if age is None else float(age)] * len(n)
+        owner += [p_idx] * len(n)
+    out: List[List[Dict[str, Any]]] = [[] for _ in prescriptions]
+    if not names:
+        return out
+    arrays = (np.array(ages, dtype=float), np.array(single, dtype=float), np.array(daily, dtype=float), np.array(freq_unknown, dtype=bool))
+    for issue in _evaluate(names, *arrays, freqs):
+        p_idx = owner[issue["row"]]
+        issue["row"] -= offsets[p_idx]
+        out[p_idx].append(issue)
+    return out
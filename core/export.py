@@ -0,0 +1,140 @@
+# core/export.py
+import argparse
+import csv
+import io
+from typing import Dict, Any, Iterator, List, Optional
+
+from core import db, metrics
+
+# Optional: Parquet/Arrow output needs pyarrow (already pulled in by streamlit); CSV works without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = ("csv", "parquet", "arrow")
+
+# Flat, one-row-per-case layout; list fields are joined into single columns
+COLUMNS = [
+    ("id", "int64"),
+    ("timestamp", "string"),
+    ("patient_id", "string"),
+    ("patient_age", "int64"),
+    ("risk_score", "int64"),
+    ("interaction_risk", "string"),
+    ("n_drugs", "int64"),
+    ("drugs", "string"),
+    ("dosages", "string"),
+    ("frequencies", "string"),
+    ("n_flags", "int64"),
+    ("flags", "string"),
+    ("interactions", "string"),
+    ("alternatives", "string"),
+    ("dosage_suggestions", "string"),
+    ("raw_text", "string"),
+]
+
+LIST_SEP = "; "
+FLAG_SEP = " | "
+
+def flatten_case(case: Dict[str, Any], include_raw_text: bool = False) -> Dict[str, Any]:
+    drugs = [d for d in case.get("drugs", []) if isinstance(d, dict)]
+    result = case.get("result", {}) or {}
+    flags = result.get("flags", []) or []
+    return {
+        "id": case.get("id"),
+        "timestamp": case.get("timestamp"),
+        "patient_id": case.get("patient_id"),
+        "patient_age": case.get("patient_age"),
+        "risk_score": case.get("risk_score"),
+        "interaction_risk": result.get("interaction_risk"),
+        "n_drugs": len(drugs),
+        "drugs": LIST_SEP.join(str(d.get("name") or "") for d in drugs),
+        "dosages": LIST_SEP.join(str(d.get("dosage") or "") for d in drugs),
+        "frequencies": LIST_SEP.join(str(d.get("frequency") or "") for d in drugs),
+        "n_flags": len(flags),
+        "flags": FLAG_SEP.join(flags),
+        "interactions": LIST_SEP.join(
+            f"{i.get('drug1')}+{i.get('drug2')}" for i in result.get("interactions", []) or []
+        ),
+        "alternatives": LIST_SEP.join(sorted(result.get("alternatives", []) or [])),
+        "dosage_suggestions": FLAG_SEP.join(result.get("dosage_suggestions", []) or []),
+        "raw_text": case.get("raw_text") if include_raw_text else None,
+    }
+
+def iter_rows(include_raw_text: bool = False, chunk_size: int = 1000, **filters) -> Iterator[List[Dict[str, Any]]]:
+    """Flattened cases, one chunk at a time; filters are passed to `db.iter_cases`."""
+    for cases in db.iter_cases(chunk_size=chunk_size, **filters):
+        yield [flatten_case(c, include_raw_text) for c in cases]
+
+def _arrow_schema():
+    return pa.schema([(name, getattr(pa, typ)()) for name, typ in COLUMNS])
+
+@metrics.timed("export.export_cases")
+def export_cases(out, fmt: str = "csv", include_raw_text: bool = False, chunk_size: int = 1000, **filters) -> int:
+    """
+    Streams matching cases to `out` (a path, or a binary file object) and returns the
+    row count. Memory stays bounded by `chunk_size` rows whatever the table size.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    if fmt != "csv" and pa is None:
+        raise RuntimeError(f"{fmt} export requires pyarrow (pip install pyarrow)")
+    chunks = iter_rows(include_raw_text=include_raw_text, chunk_size=chunk_size, **filters)
+    n = 0
+    if fmt == "csv":
+        fh = open(out, "wb") if isinstance(out, str) else out
+        text = io.TextIOWrapper(fh, encoding="utf-8", newline="", write_through=True)
+        try:
+            writer = csv.DictWriter(text, fieldnames=[name for name, _ in COLUMNS])
+            writer.writeheader()
+            for rows in chunks:
+                writer.writerows(rows)
+                n += len(rows)
+        finally:
+            if isinstance(out, str):
+                text.close()
+            else:
+                text.detach()  # leave the caller's file open to read back
+        return n
+
+    schema = _arrow_schema()
+    writer = pq.ParquetWriter(out, schema) if fmt == "parquet" else pa.ipc.new_file(out, schema)
+    try:
+        for rows in chunks:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            n += len(rows)
+    finally:
+        writer.close()
+    return n
+
+# ------------------- CLI -------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m core.export", description="Export saved cases as CSV, Parquet or Arrow")
+    parser.add_argument("--out", required=True, help="output file")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: taken from the --out extension, else csv")
+    parser.add_argument("--since", help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--until", help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("--patient", help="only this patient ID")
+    parser.add_argument("--raw-text", action="store_true", help="include the raw prescription text")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--db", default=db._DB_PATH, help="SQLite file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        ext = args.out.rsplit(".", 1)[-1].lower()
+        fmt = {"parquet": "parquet", "arrow": "arrow", "feather": "arrow"}.get(ext, "csv")
+    db._DB_PATH = args.db
+    db.init_db()
+    n = export_cases(
+        args.out, fmt,
+        include_raw_text=args.raw_text, chunk_size=args.chunk_size,
+        since=args.since, until=args.until, patient_id=args.patient
+    )
+    print(f"Exported {n} cases to {args.out} ({fmt})")
+
+if __name__ == "__main__":
+    main()
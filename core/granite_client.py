@@ -2,6 +2,8 @@ import os
 from typing import Dict, Any, List
 from dotenv import load_dotenv
 
+from core import metrics, normalize, dosage
+
 load_dotenv()
 
 MOCK_MODE = os.getenv("MOCK_MODE", "true").lower() == "true"
@@ -26,10 +28,13 @@ AGE_FLAGS = [
     (lambda age, d: age is not None and age <= 12 and "aspirin" in d, "Avoid aspirin in children due to Reye's syndrome risk.", 40),
 ]
 
+EXPLANATION = "Generated locally (Granite-mock). Replace with real Granite API later for production."
+
+@metrics.timed("granite_client.analyze")
 def analyze(parsed: Dict[str, Any]) -> Dict[str, Any]:
     """Simulated Granite: returns structured safety analysis."""
     age = parsed.get("patient_age")
-    drugs = [ (d.get("name","").lower(), d) for d in parsed.get("drugs", []) if d.get("name") ]
+    drugs = [ (normalize.canonical_name(d.get("name","")), d) for d in parsed.get("drugs", []) if d.get("name") ]
     flags: List[str] = []
     suggestions: List[str] = []
     risk_score = 15  # base
@@ -58,11 +63,10 @@ def analyze(parsed: Dict[str, Any]) -> Dict[str, Any]:
                 if nm in ALTERNATIVES:
                     suggestions.extend(ALTERNATIVES[nm])
 
-    # Dosage sanity (very naive): >1000mg single dose paracetamol
-    for nm, d in drugs:
-        dose = (d.get("dosage") or "").lower().replace(" ", "")
-        if "paracetamol" in nm and ("1000mg" in dose or "1g" in dose):
-            flags.append("High single dose of Paracetamol detected; ensure total daily dose <= 4g.")
+    # Dosage limits (mg per dose and mg/day, by age band)
+    for issue in dosage.check_doses([d for _nm, d in drugs], age):
+        flags.append(f"Dose warning: {issue['message']}")
+        if issue["kind"] != "frequency":
             risk_score += 10
 
     # Normalize
@@ -75,5 +79,5 @@ def analyze(parsed: Dict[str, Any]) -> Dict[str, Any]:
         "risk_score": risk_score,
         "flags": flags,
         "alternatives": suggestions,
-        "explanation": "Generated locally (Granite-mock). Replace with real Granite API later for production."
+        "explanation": EXPLANATION
     }
@@ -0,0 +1,174 @@
+# core/incremental.py
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from core import metrics, normalize, dosage, risk
+
+def _row_key(d: Dict[str, Any]) -> Tuple[str, str, str]:
+    return tuple(str(d.get(k) or "").strip().lower() for k in ("name", "dosage", "frequency"))
+
+class IncrementalVerifier:
+    """
+    Keeps per-prescription risk state (present drugs, per-row and per-pair
+    contributions) so that adding, removing or editing one drug only touches
+    that drug's row and its partners in `risk.PAIR_INDEX`.
+
+    `result()` returns the same shape as `risk.score_from_drugs`; every
+    mutating call returns a diff of what changed.
+    """
+
+    def __init__(self, drugs: Optional[List[Dict[str, Any]]] = None, patient_age: Optional[int] = None):
+        self.patient_age = patient_age
+        self._rows: Dict[int, Dict[str, Any]] = {}  # row id -> {"drug", "name", "contrib"}
+        self._next_id = 0
+        self._names: Counter = Counter()
+        self._pairs: Dict[int, Dict[str, Any]] = {}  # combo index -> pair contribution
+        self._flags: Counter = Counter()
+        self._alternatives: Counter = Counter()
+        self._score = risk.age_contribution(patient_age)
+        self._touched: Optional[Dict[str, Dict[Any, bool]]] = None
+        if drugs:
+            self.sync(drugs)
+
+    # ------------------- STATE CHANGES -------------------
+    def _begin(self) -> int:
+        self._touched = {"flags": {}, "alternatives": {}, "interactions": {}}
+        return self._score
+
+    def _end(self, score_before: int) -> Dict[str, Any]:
+        touched = self._touched
+        self._touched = None
+        now = {
+            "flags": lambda k: self._flags[k] > 0,
+            "alternatives": lambda k: self._alternatives[k] > 0,
+            "interactions": lambda k: k in self._pairs,
+        }
+        diff: Dict[str, Any] = {
+            "score_before": min(score_before, 100),
+            "score_after": min(self._score, 100),
+        }
+        for kind, keys in touched.items():
+            added = [k for k, was in keys.items() if not was and now[kind](k)]
+            removed = [k for k, was in keys.items() if was and not now[kind](k)]
+            if kind == "interactions":
+                added = [self._pairs[k]["interaction"] for k in sorted(added)]
+                removed = [risk.pair_contribution(k)["interaction"] for k in sorted(removed)]
+            diff[f"added_{kind}"] = added
+            diff[f"removed_{kind}"] = removed
+        return diff
+
+    def _touch(self, kind: str, key: Any, present: bool) -> None:
+        if self._touched is not None and key not in self._touched[kind]:
+            self._touched[kind][key] = present
+
+    def _bump(self, counter: Counter, kind: str, items: List[str], delta: int) -> None:
+        for item in items:
+            self._touch(kind, item, counter[item] > 0)
+            counter[item] += delta
+            if counter[item] <= 0:
+                del counter[item]
+
+    def _insert(self, drug: Dict[str, Any], row_id: Optional[int] = None) -> int:
+        if row_id is None:
+            row_id = self._next_id
+            self._next_id += 1
+        name = normalize.canonical_name(drug.get("name") or "")
+        issues = dosage.check_doses([drug], self.patient_age) if name else []
+        contrib = risk.drug_contribution(name, issues[0] if issues else None) if name else risk.drug_contribution("")
+        self._rows[row_id] = {"drug": drug, "name": name, "contrib": contrib}
+        self._score += contrib["score"]
+        self._bump(self._flags, "flags", contrib["flags"], +1)
+        self._bump(self._alternatives, "alternatives", contrib["alternatives"], +1)
+        if name:
+            self._names[name] += 1
+            if self._names[name] == 1:
+                # first occurrence: activate pairs with partners already present
+                for partner, idx in risk.PAIR_INDEX.get(name, {}).items():
+                    if self._names[partner] > 0 and idx not in self._pairs:
+                        self._touch("interactions", idx, False)
+                        self._pairs[idx] = risk.pair_contribution(idx)
+                        self._score += self._pairs[idx]["score"]
+        return row_id
+
+    def _delete(self, row_id: int) -> None:
+        row = self._rows.pop(row_id)
+        contrib, name = row["contrib"], row["name"]
+        self._score -= contrib["score"]
+        self._bump(self._flags, "flags", contrib["flags"], -1)
+        self._bump(self._alternatives, "alternatives", contrib["alternatives"], -1)
+        if name:
+            self._names[name] -= 1
+            if self._names[name] == 0:
+                del self._names[name]
+                for idx in risk.PAIR_INDEX.get(name, {}).values():
+                    if idx in self._pairs:
+                        self._touch("interactions", idx, True)
+                        self._score -= self._pairs.pop(idx)["score"]
+
+    # ------------------- PUBLIC API -------------------
+    @metrics.timed("incremental.add")
+    def add(self, drug: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        before = self._begin()
+        row_id = self._insert(drug)
+        return row_id, self._end(before)
+
+    @metrics.timed("incremental.remove")
+    def remove(self, row_id: int) -> Dict[str, Any]:
+        before = self._begin()
+        self._delete(row_id)
+        return self._end(before)
+
+    @metrics.timed("incremental.update")
+    def update(self, row_id: int, drug: Dict[str, Any]) -> Dict[str, Any]:
+        before = self._begin()
+        self._delete(row_id)
+        self._insert(drug, row_id)
+        return self._end(before)
+
+    @metrics.timed("incremental.set_age")
+    def set_age(self, patient_age: Optional[int]) -> Dict[str, Any]:
+        """Age changes every row's dose band, so this one re-evaluates all rows."""
+        before = self._begin()
+        self._score += risk.age_contribution(patient_age) - risk.age_contribution(self.patient_age)
+        self.patient_age = patient_age
+        for row_id in list(self._rows):
+            drug = self._rows[row_id]["drug"]
+            self._delete(row_id)
+            self._insert(drug, row_id)
+        return self._end(before)
+
+    @metrics.timed("incremental.sync")
+    def sync(self, drugs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Reconciles state with a full edited drug list (e.g. from `st.data_editor`).
+        Unchanged rows are matched by (name, dosage, frequency) and left alone; only
+        removed/added/edited rows are applied.
+        """
+        before = self._begin()
+        wanted = Counter(_row_key(d) for d in drugs)
+        for row_id in list(self._rows):
+            key = _row_key(self._rows[row_id]["drug"])
+            if wanted[key] > 0:
+                wanted[key] -= 1
+            else:
+                self._delete(row_id)
+        for d in drugs:
+            key = _row_key(d)
+            if wanted[key] > 0:
+                wanted[key] -= 1
+                self._insert(dict(d))
+        return self._end(before)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [r["drug"] for r in self._rows.values()]
+
+    def result(self) -> Dict[str, Any]:
+        contribs = [r["contrib"] for r in self._rows.values()]
+        return risk.finalize(
+            self._score,
+            list(self._flags),
+            list(self._alternatives),
+            [self._pairs[idx]["interaction"] for idx in sorted(self._pairs)],
+            [p for c in contribs for p in c["predicted_risks"]],
+            [s for c in contribs for s in c["dosage_suggestions"]],
+        )
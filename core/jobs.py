@@ -0,0 +1,258 @@
+# core/jobs.py
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+from dotenv import load_dotenv
+
+from core import metrics, ocr, nlp, normalize, db, report, voice
+
+load_dotenv()
+
+_DB_PATH = os.getenv("JOBS_DB", "jobs.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# A failed job is handed back for this long before the same dedupe key may run again
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "60"))
+
+ACTIVE = ("queued", "running")
+
+_tasks: Dict[str, Callable[..., Any]] = {}
+_resumable: Dict[str, bool] = {}
+_reusable: Dict[str, Callable[[Any], bool]] = {}
+_futures: Dict[str, Future] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+class JobCancelled(Exception):
+    pass
+
+def _conn():
+    return sqlite3.connect(_DB_PATH, timeout=30)
+
+# ------------------- TASK REGISTRY -------------------
+def register(kind: str, fn: Callable[..., Any], resumable: bool = True,
+             reusable: Optional[Callable[[Any], bool]] = None) -> None:
+    """
+    Registers `fn(progress, **kwargs)` as the handler for `kind`. `progress(fraction, message)`
+    records progress and raises JobCancelled once the job has been cancelled. The return
+    value must be JSON-serializable; it is persisted as the job result.
+
+    `resumable=False` jobs are cancelled, not re-run, when a restart interrupts them.
+    `reusable(result)` decides whether a finished job may still satisfy a deduplicated submit.
+    """
+    _tasks[kind] = fn
+    _resumable[kind] = resumable
+    if reusable is not None:
+        _reusable[kind] = reusable
+
+def task(kind: str, **options):
+    def deco(fn):
+        register(kind, fn, **options)
+        return fn
+    return deco
+
+# ------------------- STORAGE -------------------
+def init_jobs() -> None:
+    """Creates the jobs table and re-queues work a previous process left unfinished."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            return
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    with _conn() as c:
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS jobs(
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                label TEXT,
+                dedupe_key TEXT,
+                args_json TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                result_json TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key, status)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+        orphaned = c.execute("SELECT id, kind FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        resume = [job_id for job_id, kind in orphaned if _resumable.get(kind, True)]
+        dropped = [job_id for job_id, kind in orphaned if not _resumable.get(kind, True)]
+        # e.g. voice capture: re-running it would open the microphone with nobody prompted to speak
+        c.executemany(
+            "UPDATE jobs SET status = 'cancelled', message = 'Interrupted by restart', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            [(job_id,) for job_id in dropped]
+        )
+        c.execute("UPDATE jobs SET status = 'queued', progress = 0, message = 'Re-queued after restart' WHERE status = 'running'")
+    for job_id in resume:
+        _schedule(job_id)
+
+def _update(job_id: str, **fields) -> None:
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    with _conn() as c:
+        c.execute(f"UPDATE jobs SET {cols}, updated_at = CURRENT_TIMESTAMP WHERE id = ?", (*fields.values(), job_id))
+
+def _row_to_job(r) -> Dict[str, Any]:
+    return {
+        "id": r[0],
+        "kind": r[1],
+        "label": r[2],
+        "status": r[3],
+        "progress": r[4],
+        "message": r[5],
+        "result": json.loads(r[6]) if r[6] else None,
+        "error": r[7],
+        "created_at": r[8],
+        "updated_at": r[9],
+    }
+
+_JOB_COLUMNS = "id, kind, label, status, progress, message, result_json, error, created_at, updated_at"
+
+# ------------------- RUNNING -------------------
+def _schedule(job_id: str) -> None:
+    _futures[job_id] = _executor.submit(_run, job_id)
+
+def _run(job_id: str) -> None:
+    with _conn() as c:
+        row = c.execute("SELECT kind, args_json, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if not row or row[2] != "queued":
+        return
+    kind, args_json, _status = row
+    _update(job_id, status="running", message="Started")
+
+    def progress(fraction: float, message: str = "") -> None:
+        with _conn() as c:
+            cancelled = c.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if cancelled:
+            raise JobCancelled()
+        _update(job_id, progress=max(0.0, min(1.0, float(fraction))), message=message)
+
+    try:
+        fn = _tasks.get(kind)
+        if fn is None:
+            raise RuntimeError(f"No task registered for job kind {kind!r}")
+        with metrics.timer(f"jobs.{kind}"):
+            result = fn(progress, **json.loads(args_json))
+        _update(job_id, status="done", progress=1.0, message="Finished", result_json=json.dumps(result, ensure_ascii=False))
+    except JobCancelled:
+        _update(job_id, status="cancelled", message="Cancelled")
+    except Exception as e:
+        _update(job_id, status="failed", message="Failed", error=str(e))
+    finally:
+        _futures.pop(job_id, None)
+
+# ------------------- PUBLIC API -------------------
+def submit(kind: str, label: str = "", dedupe_key: Optional[str] = None, **kwargs) -> str:
+    """
+    Queues a job and returns its ID. With a `dedupe_key`, the latest job with that key is
+    returned instead of starting new work while it is queued, running, finished (and still
+    `reusable`), or failed less than JOB_RETRY_AFTER seconds ago.
+    """
+    if _executor is None:
+        init_jobs()
+    if kind not in _tasks:
+        raise ValueError(f"No task registered for job kind {kind!r}")
+    with _lock:
+        if dedupe_key:
+            existing = _reusable_job(kind, dedupe_key)
+            metrics.record_cache("jobs.dedupe", existing is not None)
+            if existing is not None:
+                return existing
+        job_id = uuid.uuid4().hex
+        with _conn() as c:
+            c.execute(
+                "INSERT INTO jobs(id, kind, label, dedupe_key, args_json, status) VALUES (?, ?, ?, ?, ?, 'queued')",
+                (job_id, kind, label or kind, dedupe_key, json.dumps(kwargs, ensure_ascii=False))
+            )
+    _schedule(job_id)
+    return job_id
+
+def _reusable_job(kind: str, dedupe_key: str) -> Optional[str]:
+    with _conn() as c:
+        row = c.execute(
+            """SELECT id, status, result_json, updated_at >= datetime('now', ?) FROM jobs
+               WHERE dedupe_key = ? AND status != 'cancelled'
+               ORDER BY created_at DESC, rowid DESC LIMIT 1""",
+            (f"-{JOB_RETRY_AFTER} seconds", dedupe_key)
+        ).fetchone()
+    if row is None:
+        return None
+    job_id, status, result_json, recent = row
+    if status in ACTIVE:
+        return job_id
+    if status == "failed":
+        return job_id if recent else None
+    check = _reusable.get(kind)
+    if check is not None and not check(json.loads(result_json) if result_json else None):
+        return None
+    return job_id
+
+def cancel(job_id: str) -> bool:
+    """Cancels a queued job outright; a running one stops at its next progress report."""
+    with _conn() as c:
+        c.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,))
+        queued = c.execute(
+            "UPDATE jobs SET status = 'cancelled', message = 'Cancelled', updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'queued'",
+            (job_id,)
+        ).rowcount
+    fut = _futures.get(job_id)
+    if fut is not None:
+        fut.cancel()
+    return bool(queued) or get(job_id)["status"] in ACTIVE
+
+def get(job_id: str) -> Optional[Dict[str, Any]]:
+    with _conn() as c:
+        row = c.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+def list_jobs(limit: int = 20, kinds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    query = f"SELECT {_JOB_COLUMNS} FROM jobs"
+    params: List[Any] = []
+    if kinds:
+        query += f" WHERE kind IN ({','.join('?' * len(kinds))})"
+        params += kinds
+    query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    with _conn() as c:
+        rows = c.execute(query, (*params, limit)).fetchall()
+    return [_row_to_job(r) for r in rows]
+
+def clear_finished() -> int:
+    with _conn() as c:
+        return c.execute("DELETE FROM jobs WHERE status NOT IN ('queued', 'running')").rowcount
+
+# ------------------- BUILT-IN TASKS -------------------
+@task("scan")
+def _scan(progress, image_path: str) -> Dict[str, Any]:
+    """OCR -> parse -> normalize for one uploaded prescription image; the UI verifies on load."""
+    progress(0.1, "Running OCR")
+    raw_text = ocr.extract_drug_info(image_path).get("raw_text", "")
+    progress(0.7, "Parsing drugs")
+    parsed = nlp.extract_drug_structures(raw_text)
+    parsed["drugs"] = normalize.normalize_drugs(parsed["drugs"])
+    return {"raw_text": raw_text, "parsed": parsed}
+
+@task("voice", resumable=False)
+def _voice(progress, phrase_time_limit: int = 10) -> Dict[str, Any]:
+    progress(0.1, "Listening")
+    text = voice.capture_microphone(phrase_time_limit)
+    progress(0.8, "Parsing drugs")
+    parsed = nlp.extract_drug_structures(text)
+    parsed["drugs"] = normalize.normalize_drugs(parsed["drugs"])
+    return {"raw_text": text, "parsed": parsed}
+
+@task("pdf", reusable=lambda result: bool(result) and os.path.exists(result["path"]))
+def _pdf(progress, case_id: int, outfile: str) -> Dict[str, Any]:
+    progress(0.2, "Loading case")
+    case = db.get_case(case_id)
+    if case is None:
+        raise ValueError(f"Case #{case_id} not found")
+    progress(0.5, "Building PDF")
+    return {"path": report.build_pdf(case, outfile)}
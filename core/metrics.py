@@ -0,0 +1,200 @@
+# core/metrics.py
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_PORT = os.getenv("METRICS_PORT", "")
+METRICS_LOG = os.getenv("METRICS_LOG", "")
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "15"))
+
+# Latency histogram upper bounds in seconds (an implicit +Inf bucket follows)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_stages: Dict[str, Dict[str, Any]] = {}
+_caches: Dict[str, List[int]] = {}
+_exporter_started = False
+
+# ------------------- RECORDING -------------------
+def enable(on: bool = True) -> None:
+    global ENABLED
+    ENABLED = bool(on)
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _caches.clear()
+
+def observe(stage: str, seconds: float, error: bool = False) -> None:
+    with _lock:
+        s = _stages.get(stage)
+        if s is None:
+            s = _stages[stage] = {"count": 0, "errors": 0, "sum": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+        s["count"] += 1
+        s["sum"] += seconds
+        s["buckets"][bisect_left(BUCKETS, seconds)] += 1
+        if error:
+            s["errors"] += 1
+
+def record_cache(cache: str, hit: bool) -> None:
+    if not ENABLED:
+        return
+    with _lock:
+        c = _caches.setdefault(cache, [0, 0])
+        c[0 if hit else 1] += 1
+
+@contextmanager
+def timer(stage: str):
+    """Times the enclosed block under `stage`; a no-op when metrics are disabled."""
+    if not ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe(stage, time.perf_counter() - t0, error=True)
+        raise
+    observe(stage, time.perf_counter() - t0)
+
+def timed(stage: str):
+    """Decorator form of `timer`. When disabled the only cost is one flag check."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                out = fn(*args, **kwargs)
+            except BaseException:
+                observe(stage, time.perf_counter() - t0, error=True)
+                raise
+            observe(stage, time.perf_counter() - t0)
+            return out
+        return wrapper
+    return deco
+
+# ------------------- EXPORT -------------------
+def snapshot() -> Dict[str, Any]:
+    """Point-in-time copy of all counters, suitable for display."""
+    with _lock:
+        stages = []
+        for name, s in sorted(_stages.items()):
+            stages.append({
+                "stage": name,
+                "calls": s["count"],
+                "errors": s["errors"],
+                "avg_ms": round(1000 * s["sum"] / s["count"], 2) if s["count"] else 0.0,
+                "p95_ms": _quantile_ms(s["buckets"], s["count"], 0.95),
+                "total_s": round(s["sum"], 3),
+            })
+        caches = []
+        for name, (hits, misses) in sorted(_caches.items()):
+            total = hits + misses
+            caches.append({
+                "cache": name,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+            })
+    return {"enabled": ENABLED, "stages": stages, "caches": caches}
+
+def _quantile_ms(buckets: List[int], count: int, q: float) -> Optional[float]:
+    # Upper bound of the bucket holding the q-quantile (None if it is the +Inf bucket)
+    if not count:
+        return 0.0
+    target = q * count
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= target:
+            return BUCKETS[i] * 1000 if i < len(BUCKETS) else None
+    return None
+
+def prometheus_text() -> str:
+    """Renders all metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP rx_stage_latency_seconds Latency of pipeline stages.",
+        "# TYPE rx_stage_latency_seconds histogram",
+    ]
+    with _lock:
+        stages = {k: {**v, "buckets": list(v["buckets"])} for k, v in _stages.items()}
+        caches = {k: list(v) for k, v in _caches.items()}
+    for name, s in sorted(stages.items()):
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), s["buckets"]):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'rx_stage_latency_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'rx_stage_latency_seconds_sum{{stage="{name}"}} {s["sum"]:.6f}')
+        lines.append(f'rx_stage_latency_seconds_count{{stage="{name}"}} {s["count"]}')
+    lines += [
+        "# HELP rx_stage_errors_total Calls that raised an exception.",
+        "# TYPE rx_stage_errors_total counter",
+    ]
+    for name, s in sorted(stages.items()):
+        lines.append(f'rx_stage_errors_total{{stage="{name}"}} {s["errors"]}')
+    lines += [
+        "# HELP rx_cache_requests_total Cache lookups by outcome.",
+        "# TYPE rx_cache_requests_total counter",
+    ]
+    for name, (hits, misses) in sorted(caches.items()):
+        lines.append(f'rx_cache_requests_total{{cache="{name}",result="hit"}} {hits}')
+        lines.append(f'rx_cache_requests_total{{cache="{name}",result="miss"}} {misses}')
+    return "\n".join(lines) + "\n"
+
+def write_log(path: str) -> str:
+    """Atomically writes the Prometheus text to `path` (textfile-collector friendly)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(prometheus_text())
+    os.replace(tmp, path)
+    return path
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_exporter() -> None:
+    """
+    Starts the optional exporters configured in .env, at most once per process:
+    METRICS_PORT serves /metrics over HTTP, METRICS_LOG is rewritten periodically.
+    """
+    global _exporter_started
+    if _exporter_started or not ENABLED:
+        return
+    _exporter_started = True
+    if METRICS_PORT:
+        server = ThreadingHTTPServer(("127.0.0.1", int(METRICS_PORT)), _Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    if METRICS_LOG:
+        def _loop():
+            while True:
+                time.sleep(METRICS_LOG_INTERVAL)
+                try:
+                    write_log(METRICS_LOG)
+                except OSError:
+                    pass
+        threading.Thread(target=_loop, name="metrics-log", daemon=True).start()
@@ -1,6 +1,8 @@
 import re
 from typing import Dict, Any, List
 
+from core import metrics
+
 # Optional: try to use transformers NER; fall back to regex-only if not available
 try:
     from transformers import pipeline
@@ -9,8 +11,12 @@ except Exception:
     _ner = None
 
 AGE_PAT = re.compile(r"""(?:(?:age)\s*[:\-]?\s*(\d{1,3})\b|\b(\d{1,3})\s*(?:y/o|years|yrs|yo)\b)""", re.I)
-DOSE_PAT = re.compile(r"""(\d+\s?(?:mg|mcg|g|ml|units|IU))""", re.I)
-FREQ_PAT = re.compile(r"""\b(\d-\d-\d|\d\s?\/\s?day|OD|BD|TID|QID|HS|PRN)\b""", re.I)
+DOSE_PAT = re.compile(r"""(\d+(?:\.\d+)?\s?(?:mg|mcg|g|ml|units|IU))""", re.I)
+FREQ_PAT = re.compile(
+    r"""\b(\d-\d-\d|\d\s?\/\s?day|(?:once|twice|thrice)\s+(?:a\s+)?(?:daily|day)|daily|nightly|OD|BD|BID|TID|TDS|QID|QDS|HS|PRN|SOS|STAT)\b""",
+    re.I
+)
+DURATION_PAT = re.compile(r"""\b(?:for|x)\s*(\d{1,3}\s*(?:days?|d|weeks?|wks?|months?))\b""", re.I)
 
 def _simple_drug_guess(text: str) -> List[Dict[str, str]]:
     drugs = []
@@ -22,6 +28,7 @@ def _simple_drug_guess(text: str) -> List[Dict[str, str]]:
         # heuristics: drug word at start (capitalized), or contains mg
         dose = DOSE_PAT.search(line)
         freq = FREQ_PAT.search(line)
+        duration = DURATION_PAT.search(line)
         # crude drug name guess: first token before dose
         name = None
         if dose:
@@ -36,7 +43,8 @@ def _simple_drug_guess(text: str) -> List[Dict[str, str]]:
             drugs.append({
                 "name": re.sub(r"[^A-Za-z0-9\- ]+", "", name)[:64],
                 "dosage": dose.group(1) if dose else "",
-                "frequency": freq.group(1) if freq else ""
+                "frequency": freq.group(1) if freq else "",
+                "duration": duration.group(1) if duration else ""
             })
     return drugs
 
@@ -66,6 +74,7 @@ def parse_age(text: str):
                 pass
     return None
 
+@metrics.timed("nlp.extract_drug_structures")
 def extract_drug_structures(text: str) -> Dict[str, Any]:
     text = text or ""
     age = parse_age(text)
@@ -0,0 +1,310 @@
+# core/normalize.py
+import csv
+import os
+import re
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from core import metrics
+from core.cache import LRUCache
+
+load_dotenv()
+
+# Optional extra lexicon: one generic per line, or "brand,generic" rows
+DRUG_LEXICON_PATH = os.getenv("DRUG_LEXICON_PATH", "")
+
+# SymSpell-style index parameters. Only the first PREFIX_LEN characters are
+# expanded into deletes, which bounds both index size and per-lookup work.
+MAX_EDIT = 2
+PREFIX_LEN = 7
+# A 2-edit hit is only trusted for names at least this long, and only when it is a
+# same-length-ish correction; otherwise real drugs (esomeprazole, prednisolone)
+# collapse onto their neighbours in the lexicon.
+MIN_LEN_EDIT2 = 8
+
+# Brand / alternate name -> canonical generic
+BRAND_SYNONYMS = {
+    "acetaminophen": "paracetamol",
+    "tylenol": "paracetamol",
+    "panadol": "paracetamol",
+    "calpol": "paracetamol",
+    "crocin": "paracetamol",
+    "dolo": "paracetamol",
+    "advil": "ibuprofen",
+    "motrin": "ibuprofen",
+    "nurofen": "ibuprofen",
+    "brufen": "ibuprofen",
+    "disprin": "aspirin",
+    "ecotrin": "aspirin",
+    "aleve": "naproxen",
+    "naprosyn": "naproxen",
+    "coumadin": "warfarin",
+    "jantoven": "warfarin",
+    "plavix": "clopidogrel",
+    "brilinta": "ticagrelor",
+    "prilosec": "omeprazole",
+    "losec": "omeprazole",
+    "protonix": "pantoprazole",
+    "pepcid": "famotidine",
+    "zantac": "ranitidine",
+    "glucophage": "metformin",
+    "zestril": "lisinopril",
+    "prinivil": "lisinopril",
+    "cozaar": "losartan",
+    "lipitor": "atorvastatin",
+    "zocor": "simvastatin",
+    "crestor": "rosuvastatin",
+    "lopid": "gemfibrozil",
+    "deltasone": "prednisone",
+    "cortef": "hydrocortisone",
+    "cipro": "ciprofloxacin",
+    "levaquin": "levofloxacin",
+    "amoxil": "amoxicillin",
+    "keflex": "cefalexin",
+    "zithromax": "azithromycin",
+    "biaxin": "clarithromycin",
+    "lasix": "furosemide",
+    "bumex": "bumetanide",
+    "microzide": "hydrochlorothiazide",
+    "hygroton": "chlorthalidone",
+    "synthroid": "levothyroxine",
+    "eltroxin": "levothyroxine",
+    "zanaflex": "tizanidine",
+    "trexall": "methotrexate",
+    "eliquis": "apixaban",
+    "pradaxa": "dabigatran",
+    "potassium chloride": "potassium supplement",
+    "klor-con": "potassium supplement",
+}
+
+_DOSE_TOKEN = re.compile(r"\d+(?:\.\d+)?\s*(?:mg|mcg|g|ml|iu|units)?\b")
+_FORM_TOKEN = re.compile(r"\b(?:tab|tabs|tablet|tablets|cap|caps|capsule|capsules|syrup|susp|inj|injection|sr|er|xr)\b")
+_FREQ_TOKEN = re.compile(
+    r"\b(?:\d-\d-\d|\d\s?/\s?day|od|bd|bid|tid|tds|qid|qds|hs|prn|sos|stat|daily|once|twice|thrice|nightly|po|iv|im|sc|oral)\b"
+)
+# Salt / formulation words that never change which rules apply
+_SALT_TOKEN = re.compile(
+    r"\b(?:sodium|potassium|calcium|magnesium|hydrochloride|hcl|sulfate|sulphate|maleate|besylate|succinate|"
+    r"tartrate|citrate|phosphate|acetate|bromide|mesylate|fumarate|trihydrate|monohydrate)\b"
+)
+# Common OCR digit/letter confusions inside words, e.g. "C0umadin", "Asp1rin"
+_OCR_FIXES = (("0", "o"), ("1", "l"), ("5", "s"), ("8", "b"))
+
+_lock = threading.Lock()
+_index: Optional["_SymSpellIndex"] = None
+_lookups = LRUCache("normalize.lookup", maxsize=4096)
+_MISSING = object()
+
+# ------------------- INDEX -------------------
+def _deletes(word: str, depth: int) -> Set[str]:
+    out = {word}
+    frontier = {word}
+    for _ in range(depth):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+def _distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance, abandoning early once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+class _SymSpellIndex:
+    def __init__(self, names: Iterable[str], synonyms: Dict[str, str]):
+        # term -> canonical generic (generics map to themselves)
+        self.canonical: Dict[str, str] = {}
+        for n in names:
+            n = n.strip().lower()
+            if n:
+                self.canonical.setdefault(n, n)
+        for brand, generic in synonyms.items():
+            brand, generic = brand.strip().lower(), generic.strip().lower()
+            if brand and generic:
+                self.canonical[brand] = generic
+                self.canonical.setdefault(generic, generic)
+        self.deletes: Dict[str, List[str]] = {}
+        for term in self.canonical:
+            for d in _deletes(term[:PREFIX_LEN], MAX_EDIT):
+                self.deletes.setdefault(d, []).append(term)
+
+    def lookup(self, query: str, fuzzy: bool = True) -> Optional[Tuple[str, str, int]]:
+        """Returns (matched term, canonical generic, distance) or None when no confident match exists."""
+        if query in self.canonical:
+            return query, self.canonical[query], 0
+        limit = _max_edit_for(query) if fuzzy else 0
+        if limit == 0:
+            return None
+        best_dist = limit + 1
+        best: List[str] = []
+        checked: Set[str] = set()
+        for d in _deletes(query[:PREFIX_LEN], limit):
+            for term in self.deletes.get(d, ()):
+                if term in checked:
+                    continue
+                checked.add(term)
+                dist = _distance(query, term, min(best_dist, limit))
+                if dist > limit:
+                    continue
+                if dist < best_dist:
+                    best_dist, best = dist, [term]
+                elif dist == best_dist:
+                    best.append(term)
+        if not best or not _confident(query, best, best_dist, self.canonical):
+            return None
+        term = min(best)
+        return term, self.canonical[term], best_dist
+
+def _max_edit_for(query: str) -> int:
+    # Short names tolerate fewer edits, otherwise "dolo" ~ "lopid" style false hits creep in
+    if len(query) <= 3:
+        return 0
+    if len(query) < MIN_LEN_EDIT2:
+        return 1
+    return MAX_EDIT
+
+def _confident(query: str, terms: List[str], dist: int, canonical: Dict[str, str]) -> bool:
+    # Ties between different generics are ambiguous whatever the distance
+    if len({canonical[t] for t in terms}) > 1:
+        return False
+    if dist <= 1:
+        return True
+    # Two inserted/deleted letters usually mean a different drug, not an OCR slip
+    return len(query) >= MIN_LEN_EDIT2 and abs(len(query) - len(terms[0])) <= 1
+
+def _seed_names() -> Set[str]:
+    # Imported lazily: the rule engines import this module
+    from core import risk, granite_client, dosage
+    names = set(risk.DRUG_RULES) | set(dosage.DOSE_LIMITS)
+    for pair in list(risk.HIGH_RISK_COMBOS) + list(granite_client.RISKY_PAIRS):
+        names.update(pair)
+    names.update(granite_client.ALTERNATIVES)
+    return names
+
+def load_lexicon(path: str) -> Tuple[Set[str], Dict[str, str]]:
+    names: Set[str] = set()
+    synonyms: Dict[str, str] = {}
+    with open(path, newline="", encoding="utf-8") as fh:
+        for row in csv.reader(fh):
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) >= 2 and row[1].strip():
+                synonyms[row[0]] = row[1]
+            else:
+                names.add(row[0])
+    return names, synonyms
+
+def build_index(extra_names: Iterable[str] = (), extra_synonyms: Optional[Dict[str, str]] = None) -> None:
+    """(Re)builds the process-wide index from the rule tables plus any extra lexicon."""
+    global _index
+    names = _seed_names() | set(extra_names)
+    synonyms = {**BRAND_SYNONYMS, **(extra_synonyms or {})}
+    if DRUG_LEXICON_PATH:
+        file_names, file_synonyms = load_lexicon(DRUG_LEXICON_PATH)
+        names |= file_names
+        synonyms.update(file_synonyms)
+    with metrics.timer("normalize.build_index"):
+        idx = _SymSpellIndex(names, synonyms)
+    with _lock:
+        _index = idx
+        _lookups.clear()
+
+def _get_index() -> "_SymSpellIndex":
+    if _index is None:
+        build_index()
+    return _index
+
+# ------------------- LOOKUP -------------------
+def clean_name(raw: str, strip_salts: bool = True) -> str:
+    """Lowercases and strips dose, form, frequency and salt tokens and OCR digit noise from a drug name."""
+    s = (raw or "").lower()
+    for digit, letter in _OCR_FIXES:
+        s = re.sub(rf"(?<=[a-z]){digit}(?=[a-z])", letter, s)
+    s = _FREQ_TOKEN.sub(" ", s)
+    s = _DOSE_TOKEN.sub(" ", s)
+    s = _FORM_TOKEN.sub(" ", s)
+    if strip_salts:
+        s = _SALT_TOKEN.sub(" ", s)
+    s = re.sub(r"[^a-z\- ]+", " ", s)
+    return " ".join(s.split())
+
+def lookup(raw: str) -> Optional[Dict[str, Any]]:
+    """
+    Resolves a raw drug name to its canonical generic.
+    Returns {"canonical", "matched", "distance", "via"} or None when nothing is close enough.
+    """
+    key = (raw or "").strip().lower()
+    cached = _lookups.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
+    index = _get_index()
+    # Lexicon entries that contain a salt word ("potassium supplement") must match before it is stripped
+    exact = clean_name(key, strip_salts=False)
+    hit = index.lookup(exact, fuzzy=False) if exact else None
+    if hit is None:
+        query = clean_name(key)
+        hit = _lookup_query(index, query) if query else None
+    out = None
+    if hit:
+        matched, canonical, dist = hit
+        via = "fuzzy" if dist else ("synonym" if matched != canonical else "exact")
+        out = {"canonical": canonical, "matched": matched, "distance": dist, "via": via}
+    _lookups.put(key, out)
+    return out
+
+def _lookup_query(index: "_SymSpellIndex", query: str) -> Optional[Tuple[str, str, int]]:
+    # Whole string first, then each word ("insulin glargine", "warfarin tab coumadin"):
+    # an exact word beats a fuzzy one wherever it appears.
+    hit = index.lookup(query)
+    if hit or " " not in query:
+        return hit
+    words = [w for w in query.split() if len(w) > 3]
+    for fuzzy in (False, True):
+        for w in words:
+            hit = index.lookup(w, fuzzy=fuzzy)
+            if hit:
+                return hit
+    return None
+
+def canonical_name(raw: str) -> str:
+    """Canonical generic for `raw`, or the lowercased input when it is unknown."""
+    hit = lookup(raw)
+    return hit["canonical"] if hit else (raw or "").strip().lower()
+
+def normalize_drugs(drugs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copies parsed drug rows. Exact and synonym hits set `name` to the canonical generic
+    (the original goes to `raw_name`); a fuzzy hit keeps `name` as written and records
+    the reading in `interpreted_as` for the clinician to confirm.
+    """
+    out = []
+    for d in drugs:
+        d = dict(d)
+        name = d.get("name") or ""
+        hit = lookup(name)
+        if hit and hit["canonical"] != name.strip().lower():
+            if hit["via"] == "fuzzy":
+                d["interpreted_as"] = hit["canonical"]
+            else:
+                d.setdefault("raw_name", name)
+                d["name"] = hit["canonical"]
+        out.append(d)
+    return out
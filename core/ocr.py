@@ -2,6 +2,9 @@ import re
 import pytesseract
 from PIL import Image
 
+from core import metrics
+
+@metrics.timed("ocr.extract_drug_info")
 def extract_drug_info(image_path):
     """
     Extracts drug name and dosage from an image using OCR.
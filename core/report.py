@@ -4,7 +4,10 @@ import networkx as nx
 from pyvis.network import Network
 from typing import List, Dict, Any
 
+from core import metrics
+
 # ------------------- PDF Builder (existing) -------------------
+@metrics.timed("report.build_pdf")
 def build_pdf(case: Dict[str, Any], outfile: str) -> str:
     pdf = FPDF()
     pdf.add_page()
@@ -52,6 +55,7 @@ def build_pdf(case: Dict[str, Any], outfile: str) -> str:
     return outfile
 
 # ------------------- HTML Interaction Report -------------------
+@metrics.timed("report.build_interaction_html")
 def build_interaction_html(drugs: List[Dict[str, Any]], interactions: List[Dict[str, Any]], outfile: str) -> str:
     """
     Creates an interactive HTML network showing drug interactions.
@@ -1,4 +1,131 @@
 # core/risk.py
+from core import metrics, normalize, dosage
+
+# ------------------- DRUG RULES -------------------
+DRUG_RULES = {
+    "aspirin": {"flags": ["May cause stomach bleeding"], "alternatives": ["Acetaminophen"]},
+    "ibuprofen": {"flags": ["May affect kidneys"], "alternatives": ["Naproxen"]},
+    "naproxen": {"flags": ["May cause stomach irritation"], "alternatives": ["Ibuprofen"]},
+    "paracetamol": {"flags": [], "alternatives": []},
+    "warfarin": {"flags": ["Blood thinning – risk of bleeding"], "alternatives": ["Heparin"]},
+    "amoxicillin": {"flags": ["May cause allergy"], "alternatives": ["Cefalexin"]},
+    "ciprofloxacin": {"flags": ["Can affect tendons and nerves"], "alternatives": ["Levofloxacin"]},
+    "levofloxacin": {"flags": ["QT prolongation risk"], "alternatives": ["Ciprofloxacin"]},
+    "metformin": {"flags": ["Monitor kidney function"], "alternatives": []},
+    "lisinopril": {"flags": ["May increase potassium levels"], "alternatives": ["Losartan"]},
+    "losartan": {"flags": ["Monitor blood pressure"], "alternatives": ["Lisinopril"]},
+    "atorvastatin": {"flags": ["May cause muscle pain"], "alternatives": ["Rosuvastatin"]},
+    "simvastatin": {"flags": ["May interact with grapefruit juice"], "alternatives": ["Atorvastatin"]},
+    "rosuvastatin": {"flags": ["Check liver function"], "alternatives": ["Atorvastatin"]},
+    "prednisone": {"flags": ["May increase blood sugar"], "alternatives": ["Hydrocortisone"]},
+    "hydrocortisone": {"flags": ["Monitor for immune suppression"], "alternatives": ["Prednisone"]},
+    "omeprazole": {"flags": ["Long-term use may cause kidney issues"], "alternatives": ["Pantoprazole"]},
+    "pantoprazole": {"flags": ["Rare liver effects"], "alternatives": ["Omeprazole"]},
+    "hydrochlorothiazide": {"flags": ["May lower potassium"], "alternatives": ["Chlorthalidone"]},
+    "chlorthalidone": {"flags": ["Electrolyte imbalance risk"], "alternatives": ["Hydrochlorothiazide"]},
+    "furosemide": {"flags": ["May cause dehydration"], "alternatives": ["Bumetanide"]},
+    "bumetanide": {"flags": ["Monitor electrolytes"], "alternatives": ["Furosemide"]},
+    "levothyroxine": {"flags": ["Take on empty stomach"], "alternatives": []},
+    "insulin": {"flags": ["Risk of hypoglycemia"], "alternatives": []},
+    "clopidogrel": {"flags": ["May increase bleeding risk"], "alternatives": ["Ticagrelor"]},
+    "ticagrelor": {"flags": ["Monitor platelet function"], "alternatives": ["Clopidogrel"]},
+    "heparin": {"flags": ["Monitor platelet count"], "alternatives": []},
+    "gentamicin": {"flags": ["May affect kidneys and hearing"], "alternatives": ["Amikacin"]},
+    "amikacin": {"flags": ["Ototoxicity risk"], "alternatives": ["Gentamicin"]},
+    "azithromycin": {"flags": ["May prolong QT interval"], "alternatives": ["Clarithromycin"]},
+    "clarithromycin": {"flags": ["May prolong QT interval"], "alternatives": ["Azithromycin"]},
+    "tizanidine": {"flags": ["May cause low blood pressure"], "alternatives": []},
+    "potassium supplement": {"flags": ["High potassium risk"], "alternatives": []},
+}
+
+# ------------------- HIGH-RISK COMBOS -------------------
+HIGH_RISK_COMBOS = [
+    ("aspirin", "ibuprofen"),
+    ("warfarin", "naproxen"),
+    ("warfarin", "aspirin"),
+    ("lisinopril", "potassium supplement"),
+    ("ciprofloxacin", "tizanidine"),
+    ("atorvastatin", "gemfibrozil"),
+    ("simvastatin", "clarithromycin"),
+    ("prednisone", "insulin"),
+    ("furosemide", "lisinopril"),
+    ("gentamicin", "furosemide"),
+    ("azithromycin", "simvastatin"),
+    ("ciprofloxacin", "warfarin"),
+    ("amoxicillin", "methotrexate"),
+    ("heparin", "clopidogrel"),
+]
+
+# drug -> {partner drug -> index into HIGH_RISK_COMBOS}, for O(degree) pair lookups
+PAIR_INDEX = {}
+for _i, (_a, _b) in enumerate(HIGH_RISK_COMBOS):
+    PAIR_INDEX.setdefault(_a, {})[_b] = _i
+    PAIR_INDEX.setdefault(_b, {})[_a] = _i
+
+PREDICTED_RISKS = {
+    "prednisone": "Monitor blood sugar for next 1-2 weeks",
+    "insulin": "Monitor blood sugar for next 1-2 weeks",
+    "ciprofloxacin": "May cause muscle weakness or dizziness",
+    "tizanidine": "May cause muscle weakness or dizziness",
+}
+
+EXPLANATION = "This is a demo-ready, extended risk analysis for Hackathon. Includes a large set of drugs, high-risk combos, and age considerations."
+
+# ------------------- CONTRIBUTIONS -------------------
+def drug_contribution(name, dose_issue=None):
+    """Score, flags and suggestions contributed by one (canonical) drug row on its own."""
+    c = {"score": 0, "flags": [], "alternatives": [], "predicted_risks": [], "dosage_suggestions": []}
+    rule = DRUG_RULES.get(name)
+    if rule:
+        c["flags"].extend(rule["flags"])
+        c["alternatives"].extend(rule["alternatives"])
+        if rule["flags"]:
+            c["score"] += 15  # assign points for flagged drug
+    if dose_issue and dose_issue["kind"] == "frequency":
+        # Not an overdose, but the daily limit could not be checked: flag it, no points
+        c["flags"].append(dose_issue["message"])
+        c["dosage_suggestions"].append(f"Confirm {dose_issue['drug']} frequency (max {dose_issue['limit_mg']:g} mg/day)")
+    elif dose_issue:
+        c["flags"].append(dose_issue["message"])
+        unit = "mg per dose" if dose_issue["kind"] == "single" else "mg/day"
+        c["dosage_suggestions"].append(f"Reduce {dose_issue['drug']} dosage to <= {dose_issue['limit_mg']:g} {unit}")
+        c["score"] += 20  # exceeding a dose limit
+    if name in PREDICTED_RISKS:
+        c["predicted_risks"].append(PREDICTED_RISKS[name])
+    return c
+
+def pair_contribution(combo_idx):
+    drug1, drug2 = HIGH_RISK_COMBOS[combo_idx]
+    return {"score": 40, "interaction": {"drug1": drug1, "drug2": drug2, "risk": "High"}}
+
+def age_contribution(patient_age):
+    # children and elderly have higher sensitivity
+    if patient_age is not None and (patient_age < 12 or patient_age > 65):
+        return 10
+    return 0
+
+def risk_level(risk_score):
+    if risk_score > 70:
+        return "High"
+    if risk_score > 30:
+        return "Moderate"
+    return "Low"
+
+def finalize(risk_score, flags, alternatives, interactions, predicted_risks, dosage_suggestions):
+    risk_score = min(risk_score, 100)
+
+    return {
+        "risk_score": risk_score,
+        "flags": list(set(flags)),  # remove duplicates
+        "alternatives": list(set(alternatives)),
+        "interactions": interactions,
+        "interaction_risk": risk_level(risk_score),
+        "predicted_risks": predicted_risks,
+        "dosage_suggestions": dosage_suggestions,
+        "explanation": EXPLANATION
+    }
+
+@metrics.timed("risk.score_from_drugs")
 def score_from_drugs(drugs, patient_age):
     """
     Returns a dictionary with:
@@ -8,118 +135,96 @@ def score_from_drugs(drugs, patient_age):
     - interactions (list of dangerous combos)
     """
 
-    # ------------------- DRUG RULES -------------------
-    DRUG_RULES = {
-        "aspirin": {"flags": ["May cause stomach bleeding"], "alternatives": ["Acetaminophen"]},
-        "ibuprofen": {"flags": ["May affect kidneys"], "alternatives": ["Naproxen"]},
-        "naproxen": {"flags": ["May cause stomach irritation"], "alternatives": ["Ibuprofen"]},
-        "paracetamol": {"flags": [], "alternatives": []},
-        "warfarin": {"flags": ["Blood thinning – risk of bleeding"], "alternatives": ["Heparin"]},
-        "amoxicillin": {"flags": ["May cause allergy"], "alternatives": ["Cefalexin"]},
-        "ciprofloxacin": {"flags": ["Can affect tendons and nerves"], "alternatives": ["Levofloxacin"]},
-        "levofloxacin": {"flags": ["QT prolongation risk"], "alternatives": ["Ciprofloxacin"]},
-        "metformin": {"flags": ["Monitor kidney function"], "alternatives": []},
-        "lisinopril": {"flags": ["May increase potassium levels"], "alternatives": ["Losartan"]},
-        "losartan": {"flags": ["Monitor blood pressure"], "alternatives": ["Lisinopril"]},
-        "atorvastatin": {"flags": ["May cause muscle pain"], "alternatives": ["Rosuvastatin"]},
-        "simvastatin": {"flags": ["May interact with grapefruit juice"], "alternatives": ["Atorvastatin"]},
-        "rosuvastatin": {"flags": ["Check liver function"], "alternatives": ["Atorvastatin"]},
-        "prednisone": {"flags": ["May increase blood sugar"], "alternatives": ["Hydrocortisone"]},
-        "hydrocortisone": {"flags": ["Monitor for immune suppression"], "alternatives": ["Prednisone"]},
-        "omeprazole": {"flags": ["Long-term use may cause kidney issues"], "alternatives": ["Pantoprazole"]},
-        "pantoprazole": {"flags": ["Rare liver effects"], "alternatives": ["Omeprazole"]},
-        "hydrochlorothiazide": {"flags": ["May lower potassium"], "alternatives": ["Chlorthalidone"]},
-        "chlorthalidone": {"flags": ["Electrolyte imbalance risk"], "alternatives": ["Hydrochlorothiazide"]},
-        "furosemide": {"flags": ["May cause dehydration"], "alternatives": ["Bumetanide"]},
-        "bumetanide": {"flags": ["Monitor electrolytes"], "alternatives": ["Furosemide"]},
-        "levothyroxine": {"flags": ["Take on empty stomach"], "alternatives": []},
-        "insulin": {"flags": ["Risk of hypoglycemia"], "alternatives": []},
-        "clopidogrel": {"flags": ["May increase bleeding risk"], "alternatives": ["Ticagrelor"]},
-        "ticagrelor": {"flags": ["Monitor platelet function"], "alternatives": ["Clopidogrel"]},
-        "heparin": {"flags": ["Monitor platelet count"], "alternatives": []},
-        "gentamicin": {"flags": ["May affect kidneys and hearing"], "alternatives": ["Amikacin"]},
-        "amikacin": {"flags": ["Ototoxicity risk"], "alternatives": ["Gentamicin"]},
-        "azithromycin": {"flags": ["May prolong QT interval"], "alternatives": ["Clarithromycin"]},
-        "clarithromycin": {"flags": ["May prolong QT interval"], "alternatives": ["Azithromycin"]},
-        "tizanidine": {"flags": ["May cause low blood pressure"], "alternatives": []},
-        "potassium supplement": {"flags": ["High potassium risk"], "alternatives": []},
-    }
-
-    # ------------------- HIGH-RISK COMBOS -------------------
-    HIGH_RISK_COMBOS = [
-        ("aspirin", "ibuprofen"),
-        ("warfarin", "naproxen"),
-        ("warfarin", "aspirin"),
-        ("lisinopril", "potassium supplement"),
-        ("ciprofloxacin", "tizanidine"),
-        ("atorvastatin", "gemfibrozil"),
-        ("simvastatin", "clarithromycin"),
-        ("prednisone", "insulin"),
-        ("furosemide", "lisinopril"),
-        ("gentamicin", "furosemide"),
-        ("azithromycin", "simvastatin"),
-        ("ciprofloxacin", "warfarin"),
-        ("amoxicillin", "methotrexate"),
-        ("heparin", "clopidogrel"),
-    ]
-
     # ------------------- INITIALIZE -------------------
     flags = []
     alternatives = []
     interactions = []
     dosage_suggestions = []
+    predicted_risks = []
     risk_score = 0
 
-    drugs_lower = [d["name"].lower() for d in drugs if "name" in d]
-
-    # ------------------- CHECK INDIVIDUAL DRUGS -------------------
-    for d in drugs_lower:
-        if d in DRUG_RULES:
-            flags.extend(DRUG_RULES[d]["flags"])
-            alternatives.extend(DRUG_RULES[d]["alternatives"])
-            if DRUG_RULES[d]["flags"]:
-                risk_score += 15  # assign points for flagged drug
-            # Dosage suggestions placeholder
-            if "dosage" in d:
-                dosage = d.get("dosage", None)
-                max_dose = DRUG_RULES[d]["max_dosage"]
-                if dosage and dosage > max_dose:
-                    dosage_suggestions.append(f"Reduce {d} dosage to <= {max_dose} mg")
+    named = [d for d in drugs if d.get("name")]
+    drugs_lower = [normalize.canonical_name(d["name"]) for d in named]
+
+    # ------------------- CHECK INDIVIDUAL DRUGS + DOSAGES -------------------
+    dose_issues = {issue["row"]: issue for issue in dosage.check_doses(named, patient_age)}
+    for row, d in enumerate(drugs_lower):
+        c = drug_contribution(d, dose_issues.get(row))
+        risk_score += c["score"]
+        flags.extend(c["flags"])
+        alternatives.extend(c["alternatives"])
+        predicted_risks.extend(c["predicted_risks"])
+        dosage_suggestions.extend(c["dosage_suggestions"])
 
     # ------------------- CHECK COMBINATIONS -------------------
-    for combo in HIGH_RISK_COMBOS:
-        if combo[0] in drugs_lower and combo[1] in drugs_lower:
-            interactions.append({"drug1": combo[0], "drug2": combo[1], "risk": "High"})
-            risk_score += 40  # extra points for dangerous combo
+    present = set(drugs_lower)
+    for idx, combo in enumerate(HIGH_RISK_COMBOS):
+        if combo[0] in present and combo[1] in present:
+            p = pair_contribution(idx)
+            interactions.append(p["interaction"])
+            risk_score += p["score"]  # extra points for dangerous combo
 
     # ------------------- AGE-SPECIFIC RISK -------------------
-    if patient_age < 12 or patient_age > 65:
-        risk_score += 10  # children and elderly have higher sensitivity
-    # ------------------- PREDICTED FUTURE RISKS -------------------
-    predicted_risks = []
-    for d in drugs_lower:
-        if d in ["prednisone", "insulin"]:
-            predicted_risks.append("Monitor blood sugar for next 1-2 weeks")
-        if d in ["ciprofloxacin", "tizanidine"]:
-            predicted_risks.append("May cause muscle weakness or dizziness")
+    risk_score += age_contribution(patient_age)
+
     # ------------------- FINALIZE -------------------
-    risk_score = min(risk_score, 100)
+    return finalize(risk_score, flags, alternatives, interactions, predicted_risks, dosage_suggestions)
 
-    if risk_score > 70:
-        interaction_risk = "High"
-    elif risk_score > 30:
-        interaction_risk = "Moderate"
-    else:
-        interaction_risk = "Low"
-    
-    return {
-    "risk_score": risk_score,
-    "flags": list(set(flags)),  # remove duplicates
-    "alternatives": list(set(alternatives)),
-    "interactions": interactions,
-    "interaction_risk": interaction_risk,
-    "predicted_risks": predicted_risks,  # ✅ correct way to include
-    "dosage_suggestions": dosage_suggestions,
-    "explanation": "This is a demo-ready, extended risk analysis for Hackathon. Includes a large set of drugs, high-risk combos, and age considerations."
-}
+# ------------------- PATIENT HISTORY -------------------
+HISTORY_FLAG_PREFIX = "Interaction with active medication: "
+
+def history_partners(drugs):
+    """Canonical names that form a high-risk combo with any drug in `drugs`."""
+    partners = set()
+    for d in drugs:
+        if d.get("name"):
+            partners.update(PAIR_INDEX.get(normalize.canonical_name(d["name"]), {}))
+    return partners
+
+def history_interactions(drugs, active):
+    """
+    High-risk combos between a new prescription and the patient's still-active
+    medications (rows from `db.active_medications`). Fetch `active` restricted to
+    `history_partners(drugs)` and the cost is O(new drugs x their partners) however
+    long the history is. Pairs already inside the new prescription are skipped;
+    `score_from_drugs` reports those.
+    """
+    new = {normalize.canonical_name(d["name"]) for d in drugs if d.get("name")}
+    by_drug = {}
+    for med in active:
+        by_drug.setdefault(med["drug"], med)  # most recent course first
+    found = []
+    for name in sorted(new):
+        for partner, idx in PAIR_INDEX.get(name, {}).items():
+            med = by_drug.get(partner)
+            if med is None or partner in new:
+                continue
+            p = pair_contribution(idx)
+            found.append({
+                **p["interaction"],
+                "source": "history",
+                "case_id": med["case_id"],
+                "start_date": med["start_date"],
+                "end_date": med["end_date"],
+            })
+    return found
 
+def apply_history(result, drugs, active):
+    """Returns `result` extended with interactions against the patient's active medications."""
+    found = history_interactions(drugs, active)
+    if not found:
+        return result
+    flags = list(result.get("flags", []))
+    for i in found:
+        flags.append(
+            f"{HISTORY_FLAG_PREFIX}{i['drug1'].title()} + {i['drug2'].title()} "
+            f"(case #{i['case_id']}, until {i['end_date']})"
+        )
+    risk_score = min(result.get("risk_score", 0) + 40 * len(found), 100)
+    return {
+        **result,
+        "flags": flags,
+        "interactions": list(result.get("interactions", [])) + found,
+        "risk_score": risk_score,
+        "interaction_risk": risk_level(risk_score),
+    }
@@ -0,0 +1,158 @@
+# core/verdict_cache.py
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+from bisect import bisect_right
+from typing import Dict, Any, Callable, List, Optional
+
+from dotenv import load_dotenv
+
+from core import metrics, normalize, dosage, risk, granite_client
+from core.cache import LRUCache
+
+load_dotenv()
+
+# Optional shared tier, e.g. a file on a volume several app instances can reach
+VERDICT_CACHE_DB = os.getenv("VERDICT_CACHE_DB", "")
+
+# Bump when scoring logic changes in a way the rule tables below do not capture
+KB_REVISION = 2
+
+# Every age threshold any rule compares against, as "age < x" cut points:
+# risk (<12, >65), granite AGE_FLAGS (<=12, >=65) and the dosage age bands.
+AGE_BREAKPOINTS = tuple(sorted({12, 13, 66} | {lo for _band, lo, _hi in dosage.AGE_BANDS[1:]}))
+
+_memory = LRUCache("verdict.memory", maxsize=2048)
+_kb_version: Optional[str] = None
+_db_ready = False
+
+# ------------------- KNOWLEDGE-BASE VERSION -------------------
+def _kb_payload() -> Dict[str, Any]:
+    return {
+        "revision": KB_REVISION,
+        "drug_rules": risk.DRUG_RULES,
+        "high_risk_combos": risk.HIGH_RISK_COMBOS,
+        "predicted_risks": risk.PREDICTED_RISKS,
+        "explanation": risk.EXPLANATION,
+        "risky_pairs": sorted([list(k), v] for k, v in granite_client.RISKY_PAIRS.items()),
+        "granite_alternatives": granite_client.ALTERNATIVES,
+        "age_flags": [[msg, radd] for _pred, msg, radd in granite_client.AGE_FLAGS],
+        "dose_limits": dosage.DOSE_LIMITS,
+        "age_bands": dosage.AGE_BANDS,
+        "age_breakpoints": AGE_BREAKPOINTS,
+    }
+
+def kb_version(refresh: bool = False) -> str:
+    """Hash of every rule table that feeds a verdict; cached entries from other versions are ignored."""
+    global _kb_version
+    if _kb_version is None or refresh:
+        blob = json.dumps(_kb_payload(), sort_keys=True, ensure_ascii=False)
+        _kb_version = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+    return _kb_version
+
+# ------------------- SIGNATURE -------------------
+def age_band(age: Optional[int]) -> str:
+    return "unknown" if age is None else f"b{bisect_right(AGE_BREAKPOINTS, age)}"
+
+def canonical_form(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduces a parsed prescription to what the rule engines actually read:
+    canonical drug names, mg per dose and doses per day ("?" when the frequency
+    is written but unrecognised), and the age band.
+    """
+    drugs: List[List[Any]] = []
+    for d in parsed.get("drugs", []):
+        if not d.get("name"):
+            continue
+        single = dosage.parse_dose_mg(d.get("dosage"))
+        per_day = dosage.parse_frequency(d.get("frequency")) if single is not None else None
+        if single is not None and per_day is None:
+            per_day = "?" if dosage.unrecognised_frequency(d.get("frequency")) else 1.0
+        drugs.append([
+            normalize.canonical_name(d["name"]),
+            None if single is None else round(single, 4),
+            per_day,
+        ])
+    drugs.sort(key=lambda r: json.dumps(r))
+    return {"drugs": drugs, "age_band": age_band(parsed.get("patient_age"))}
+
+def signature(parsed: Dict[str, Any]) -> str:
+    blob = json.dumps(canonical_form(parsed), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+# ------------------- SQLITE TIER -------------------
+def _conn():
+    return sqlite3.connect(VERDICT_CACHE_DB)
+
+def _init_db() -> None:
+    global _db_ready
+    with _conn() as c:
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS verdict_cache(
+                signature TEXT PRIMARY KEY,
+                kb_version TEXT NOT NULL,
+                verdict_json TEXT NOT NULL,
+                ts DATETIME DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+        # Entries from an older knowledge base can never be served again
+        c.execute("DELETE FROM verdict_cache WHERE kb_version != ?", (kb_version(),))
+    _db_ready = True
+
+def _db_get(sig: str) -> Optional[Dict[str, Any]]:
+    if not VERDICT_CACHE_DB:
+        return None
+    if not _db_ready:
+        _init_db()
+    with _conn() as c:
+        row = c.execute(
+            "SELECT verdict_json FROM verdict_cache WHERE signature=? AND kb_version=?",
+            (sig, kb_version())
+        ).fetchone()
+    metrics.record_cache("verdict.sqlite", row is not None)
+    return json.loads(row[0]) if row else None
+
+def _db_put(sig: str, verdict: Dict[str, Any]) -> None:
+    if not VERDICT_CACHE_DB:
+        return
+    if not _db_ready:
+        _init_db()
+    with _conn() as c:
+        c.execute(
+            "INSERT OR REPLACE INTO verdict_cache(signature, kb_version, verdict_json) VALUES (?, ?, ?)",
+            (sig, kb_version(), json.dumps(verdict, ensure_ascii=False))
+        )
+
+# ------------------- VERIFY -------------------
+def compute_verdict(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """Full merged verdict: Granite analysis overlaid with the extended risk engine."""
+    granite_result = granite_client.analyze(parsed)
+    custom_risk = risk.score_from_drugs(parsed.get("drugs", []), parsed.get("patient_age"))
+    return {**granite_result, **custom_risk}
+
+@metrics.timed("verdict_cache.verify")
+def verify(parsed: Dict[str, Any], compute: Optional[Callable[[], Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Memoized `compute_verdict`. `compute` may supply an equivalent verdict on a miss
+    (e.g. `IncrementalVerifier.result`). Returns a copy callers are free to mutate.
+    """
+    sig = signature(parsed)
+    key = (kb_version(), sig)
+    verdict = _memory.get(key)
+    if verdict is None:
+        verdict = _db_get(sig)
+        if verdict is None:
+            verdict = compute() if compute else compute_verdict(parsed)
+            _db_put(sig, verdict)
+        _memory.put(key, verdict)
+    return copy.deepcopy(verdict)
+
+def clear() -> None:
+    global _db_ready
+    _memory.clear()
+    if VERDICT_CACHE_DB:
+        with _conn() as c:
+            c.execute("DROP TABLE IF EXISTS verdict_cache")
+        _db_ready = False
@@ -1,14 +1,27 @@
-import speech_recognition as sr
-
-def transcribe_audio(file_path: str) -> str:
-    """Transcribe audio file to text using SpeechRecognition."""
-    r = sr.Recognizer()
-    with sr.AudioFile(file_path) as source:
-        audio = r.record(source)
-    try:
-        text = r.recognize_google(audio)
-        return text
-    except sr.UnknownValueError:
-        return "Could not understand audio"
-    except sr.RequestError:
-        return "Speech recognition service failed"
+import speech_recognition as sr
+
+def transcribe_audio(file_path: str) -> str:
+    """Transcribe audio file to text using SpeechRecognition."""
+    r = sr.Recognizer()
+    with sr.AudioFile(file_path) as source:
+        audio = r.record(source)
+    try:
+        text = r.recognize_google(audio)
+        return text
+    except sr.UnknownValueError:
+        return "Could not understand audio"
+    except sr.RequestError:
+        return "Speech recognition service failed"
+
+def capture_microphone(phrase_time_limit: int = 10) -> str:
+    """Record one phrase from the default microphone and transcribe it."""
+    r = sr.Recognizer()
+    with sr.Microphone() as source:
+        audio = r.listen(source, phrase_time_limit=phrase_time_limit)
+    # Raised rather than returned, so callers never mistake the message for a transcript
+    try:
+        return r.recognize_google(audio)
+    except sr.UnknownValueError:
+        raise RuntimeError("Could not understand audio")
+    except sr.RequestError:
+        raise RuntimeError("Speech recognition service failed")
@@ -0,0 +1,57 @@
+from core import dosage, nlp, risk
+
+
+def _parse(text):
+    return nlp.extract_drug_structures(text)["drugs"][0]
+
+
+def test_decimal_doses_are_parsed_whole():
+    d = _parse("Warfarin 12.5 mg OD")
+    assert d["name"] == "Warfarin"
+    assert d["dosage"] == "12.5 mg"
+    assert dosage.parse_dose_mg(_parse("Levothyroxine 0.1 mg")["dosage"]) == 0.1
+    assert dosage.parse_dose_mg(_parse("Paracetamol 1.5 g")["dosage"]) == 1500
+
+
+def test_decimal_overdose_is_flagged():
+    issues = dosage.check_doses([_parse("Warfarin 12.5 mg OD")], 40)
+    assert [(i["kind"], i["dose_mg"], i["limit_mg"]) for i in issues] == [("single", 12.5, 10)]
+
+
+def test_frequency_abbreviations():
+    for freq, per_day in [("BID", 2), ("TDS", 3), ("QDS", 4), ("daily", 1), ("twice daily", 2), ("once a day", 1)]:
+        assert dosage.parse_frequency(freq) == per_day, freq
+        assert _parse(f"Paracetamol 500mg {freq}")["frequency"].lower() == freq.lower()
+
+
+def test_qds_daily_overdose_for_elderly():
+    issues = dosage.check_doses([_parse("Paracetamol 1000mg QDS")], 70)
+    assert [(i["kind"], i["dose_mg"], i["limit_mg"]) for i in issues] == [("daily", 4000, 3000)]
+
+
+def test_doctor_edited_tds_is_checked():
+    issues = dosage.check_doses([{"name": "naproxen", "dosage": "250mg", "frequency": "TDS"}], 70)
+    assert [i["kind"] for i in issues] == ["daily"]
+
+
+def test_unrecognised_frequency_is_flagged_not_assumed_once_daily():
+    drug = {"name": "paracetamol", "dosage": "1000mg", "frequency": "q4h"}
+    assert dosage.daily_mg(drug["dosage"], drug["frequency"]) is None
+    issues = dosage.check_doses([drug], 70)
+    assert [i["kind"] for i in issues] == ["frequency"]
+    result = risk.score_from_drugs([drug], 30)
+    assert any("not recognised" in f for f in result["flags"])
+
+
+def test_as_needed_is_not_flagged():
+    assert dosage.check_doses([{"name": "paracetamol", "dosage": "500mg", "frequency": "PRN"}], 30) == []
+
+
+def test_batch_matches_single_checks():
+    prescriptions = [
+        {"patient_age": 70, "drugs": [{"name": "paracetamol", "dosage": "1000mg", "frequency": "QDS"}]},
+        {"patient_age": 40, "drugs": [{"name": "warfarin", "dosage": "12.5mg", "frequency": "OD"}]},
+        {"patient_age": 30, "drugs": [{"name": "ibuprofen", "dosage": "400mg", "frequency": "q4h"}]},
+    ]
+    batch = dosage.check_batch(prescriptions)
+    assert batch == [dosage.check_doses(p["drugs"], p["patient_age"]) for p in prescriptions]
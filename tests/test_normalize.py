@@ -0,0 +1,21 @@
+from core import normalize
+
+
+def _canonical(raw):
+    hit = normalize.lookup(raw)
+    return hit["canonical"] if hit else None
+
+
+def test_salt_words_are_ignored():
+    assert _canonical("Warfarin sodium") == "warfarin"
+    assert _canonical("Metformin HCl 500mg BD") == "metformin"
+
+
+def test_lexicon_entries_containing_salt_words_still_match():
+    assert _canonical("Potassium supplement") == "potassium supplement"
+    assert _canonical("Potassium Chloride 20mg OD") == "potassium supplement"
+
+
+def test_distinct_drugs_are_not_collapsed():
+    assert _canonical("Esomeprazole") is None
+    assert _canonical("Prednisolone") is None